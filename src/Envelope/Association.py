@@ -0,0 +1,8 @@
+# automatically generated by the FlatBuffers compiler, do not modify
+
+# namespace: Envelope
+
+class Association(object):
+    Point = 0
+    Cell = 1
+    Field = 2
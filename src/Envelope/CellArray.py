@@ -0,0 +1,193 @@
+# automatically generated by the FlatBuffers compiler, do not modify
+
+# namespace: Envelope
+
+import flatbuffers
+from flatbuffers.compat import import_numpy
+np = import_numpy()
+
+class CellArray(object):
+    __slots__ = ['_tab']
+
+    @classmethod
+    def GetRootAs(cls, buf, offset=0):
+        n = flatbuffers.encode.Get(flatbuffers.packer.uoffset, buf, offset)
+        x = CellArray()
+        x.Init(buf, n + offset)
+        return x
+
+    @classmethod
+    def GetRootAsCellArray(cls, buf, offset=0):
+        """This method is deprecated. Please switch to GetRootAs."""
+        return cls.GetRootAs(buf, offset)
+    # CellArray
+    def Init(self, buf, pos):
+        self._tab = flatbuffers.table.Table(buf, pos)
+
+    # CellArray
+    def Offsets(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int32Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return 0
+
+    # CellArray
+    def OffsetsAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int32Flags, o)
+        return 0
+
+    # CellArray
+    def OffsetsLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # CellArray
+    def OffsetsIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        return o == 0
+
+    # CellArray
+    def Connectivity(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int32Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return 0
+
+    # CellArray
+    def ConnectivityAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int32Flags, o)
+        return 0
+
+    # CellArray
+    def ConnectivityLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # CellArray
+    def ConnectivityIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
+        return o == 0
+
+    # CellArray
+    def Offsets64(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int64Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 8))
+        return 0
+
+    # CellArray
+    def Offsets64AsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int64Flags, o)
+        return 0
+
+    # CellArray
+    def Offsets64Length(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # CellArray
+    def Offsets64IsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        return o == 0
+
+    # CellArray
+    def Connectivity64(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int64Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 8))
+        return 0
+
+    # CellArray
+    def Connectivity64AsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int64Flags, o)
+        return 0
+
+    # CellArray
+    def Connectivity64Length(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # CellArray
+    def Connectivity64IsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        return o == 0
+
+def CellArrayStart(builder):
+    builder.StartObject(4)
+
+def Start(builder):
+    CellArrayStart(builder)
+
+def CellArrayAddOffsets(builder, offsets):
+    builder.PrependUOffsetTRelativeSlot(0, flatbuffers.number_types.UOffsetTFlags.py_type(offsets), 0)
+
+def AddOffsets(builder, offsets):
+    CellArrayAddOffsets(builder, offsets)
+
+def CellArrayStartOffsetsVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartOffsetsVector(builder, numElems):
+    return CellArrayStartOffsetsVector(builder, numElems)
+
+def CellArrayAddConnectivity(builder, connectivity):
+    builder.PrependUOffsetTRelativeSlot(1, flatbuffers.number_types.UOffsetTFlags.py_type(connectivity), 0)
+
+def AddConnectivity(builder, connectivity):
+    CellArrayAddConnectivity(builder, connectivity)
+
+def CellArrayStartConnectivityVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartConnectivityVector(builder, numElems):
+    return CellArrayStartConnectivityVector(builder, numElems)
+
+def CellArrayAddOffsets64(builder, offsets64):
+    builder.PrependUOffsetTRelativeSlot(2, flatbuffers.number_types.UOffsetTFlags.py_type(offsets64), 0)
+
+def AddOffsets64(builder, offsets64):
+    CellArrayAddOffsets64(builder, offsets64)
+
+def CellArrayStartOffsets64Vector(builder, numElems):
+    return builder.StartVector(8, numElems, 8)
+
+def StartOffsets64Vector(builder, numElems):
+    return CellArrayStartOffsets64Vector(builder, numElems)
+
+def CellArrayAddConnectivity64(builder, connectivity64):
+    builder.PrependUOffsetTRelativeSlot(3, flatbuffers.number_types.UOffsetTFlags.py_type(connectivity64), 0)
+
+def AddConnectivity64(builder, connectivity64):
+    CellArrayAddConnectivity64(builder, connectivity64)
+
+def CellArrayStartConnectivity64Vector(builder, numElems):
+    return builder.StartVector(8, numElems, 8)
+
+def StartConnectivity64Vector(builder, numElems):
+    return CellArrayStartConnectivity64Vector(builder, numElems)
+
+def CellArrayEnd(builder):
+    return builder.EndObject()
+
+def End(builder):
+    return CellArrayEnd(builder)
@@ -0,0 +1,9 @@
+# automatically generated by the FlatBuffers compiler, do not modify
+
+# namespace: Envelope
+
+class Codec(object):
+    Raw = 0
+    Zlib = 1
+    LZ4 = 2
+    Zstd = 3
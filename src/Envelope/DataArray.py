@@ -0,0 +1,271 @@
+# automatically generated by the FlatBuffers compiler, do not modify
+
+# namespace: Envelope
+
+import flatbuffers
+from flatbuffers.compat import import_numpy
+np = import_numpy()
+
+class DataArray(object):
+    __slots__ = ['_tab']
+
+    @classmethod
+    def GetRootAs(cls, buf, offset=0):
+        n = flatbuffers.encode.Get(flatbuffers.packer.uoffset, buf, offset)
+        x = DataArray()
+        x.Init(buf, n + offset)
+        return x
+
+    @classmethod
+    def GetRootAsDataArray(cls, buf, offset=0):
+        """This method is deprecated. Please switch to GetRootAs."""
+        return cls.GetRootAs(buf, offset)
+    # DataArray
+    def Init(self, buf, pos):
+        self._tab = flatbuffers.table.Table(buf, pos)
+
+    # DataArray
+    def Name(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        if o != 0:
+            return self._tab.String(o + self._tab.Pos)
+        return None
+
+    # DataArray
+    def Association(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, o + self._tab.Pos)
+        return 0
+
+    # DataArray
+    def Type(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, o + self._tab.Pos)
+        return 0
+
+    # DataArray
+    def Components(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Uint32Flags, o + self._tab.Pos)
+        return 0
+
+    # DataArray
+    def Data(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 1))
+        return 0
+
+    # DataArray
+    def DataAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Uint8Flags, o)
+        return 0
+
+    # DataArray
+    def DataLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # DataArray
+    def DataIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        return o == 0
+
+    # DataArray
+    def Codec(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, o + self._tab.Pos)
+        return 0
+
+    # DataArray
+    def Shuffle(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(16))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.BoolFlags, o + self._tab.Pos)
+        return False
+
+    # DataArray
+    def Size(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(18))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Uint64Flags, o + self._tab.Pos)
+        return 0
+
+    # DataArray
+    def Quantization(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(20))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, o + self._tab.Pos)
+        return 0
+
+    # DataArray
+    def Minimum(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(22))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Float64Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 8))
+        return 0
+
+    # DataArray
+    def MinimumAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(22))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Float64Flags, o)
+        return 0
+
+    # DataArray
+    def MinimumLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(22))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # DataArray
+    def MinimumIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(22))
+        return o == 0
+
+    # DataArray
+    def Maximum(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(24))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Float64Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 8))
+        return 0
+
+    # DataArray
+    def MaximumAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(24))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Float64Flags, o)
+        return 0
+
+    # DataArray
+    def MaximumLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(24))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # DataArray
+    def MaximumIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(24))
+        return o == 0
+
+    # DataArray
+    def ValueType(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(26))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, o + self._tab.Pos)
+        return 0
+
+def DataArrayStart(builder):
+    builder.StartObject(12)
+
+def Start(builder):
+    DataArrayStart(builder)
+
+def DataArrayAddName(builder, name):
+    builder.PrependUOffsetTRelativeSlot(0, flatbuffers.number_types.UOffsetTFlags.py_type(name), 0)
+
+def AddName(builder, name):
+    DataArrayAddName(builder, name)
+
+def DataArrayAddAssociation(builder, association):
+    builder.PrependUint8Slot(1, association, 0)
+
+def AddAssociation(builder, association):
+    DataArrayAddAssociation(builder, association)
+
+def DataArrayAddType(builder, type):
+    builder.PrependUint8Slot(2, type, 0)
+
+def AddType(builder, type):
+    DataArrayAddType(builder, type)
+
+def DataArrayAddComponents(builder, components):
+    builder.PrependUint32Slot(3, components, 0)
+
+def AddComponents(builder, components):
+    DataArrayAddComponents(builder, components)
+
+def DataArrayAddData(builder, data):
+    builder.PrependUOffsetTRelativeSlot(4, flatbuffers.number_types.UOffsetTFlags.py_type(data), 0)
+
+def AddData(builder, data):
+    DataArrayAddData(builder, data)
+
+def DataArrayStartDataVector(builder, numElems):
+    return builder.StartVector(1, numElems, 1)
+
+def StartDataVector(builder, numElems):
+    return DataArrayStartDataVector(builder, numElems)
+
+def DataArrayAddCodec(builder, codec):
+    builder.PrependUint8Slot(5, codec, 0)
+
+def AddCodec(builder, codec):
+    DataArrayAddCodec(builder, codec)
+
+def DataArrayAddShuffle(builder, shuffle):
+    builder.PrependBoolSlot(6, shuffle, False)
+
+def AddShuffle(builder, shuffle):
+    DataArrayAddShuffle(builder, shuffle)
+
+def DataArrayAddSize(builder, size):
+    builder.PrependUint64Slot(7, size, 0)
+
+def AddSize(builder, size):
+    DataArrayAddSize(builder, size)
+
+def DataArrayAddQuantization(builder, quantization):
+    builder.PrependUint8Slot(8, quantization, 0)
+
+def AddQuantization(builder, quantization):
+    DataArrayAddQuantization(builder, quantization)
+
+def DataArrayAddMinimum(builder, minimum):
+    builder.PrependUOffsetTRelativeSlot(9, flatbuffers.number_types.UOffsetTFlags.py_type(minimum), 0)
+
+def AddMinimum(builder, minimum):
+    DataArrayAddMinimum(builder, minimum)
+
+def DataArrayStartMinimumVector(builder, numElems):
+    return builder.StartVector(8, numElems, 8)
+
+def StartMinimumVector(builder, numElems):
+    return DataArrayStartMinimumVector(builder, numElems)
+
+def DataArrayAddMaximum(builder, maximum):
+    builder.PrependUOffsetTRelativeSlot(10, flatbuffers.number_types.UOffsetTFlags.py_type(maximum), 0)
+
+def AddMaximum(builder, maximum):
+    DataArrayAddMaximum(builder, maximum)
+
+def DataArrayStartMaximumVector(builder, numElems):
+    return builder.StartVector(8, numElems, 8)
+
+def StartMaximumVector(builder, numElems):
+    return DataArrayStartMaximumVector(builder, numElems)
+
+def DataArrayAddValueType(builder, valueType):
+    builder.PrependUint8Slot(11, valueType, 0)
+
+def AddValueType(builder, valueType):
+    DataArrayAddValueType(builder, valueType)
+
+def DataArrayEnd(builder):
+    return builder.EndObject()
+
+def End(builder):
+    return DataArrayEnd(builder)
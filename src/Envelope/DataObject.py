@@ -38,8 +38,84 @@ class DataObject(object):
             return self._tab.String(o + self._tab.Pos)
         return None
 
+    # DataObject
+    def TopologyId(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Uint64Flags, o + self._tab.Pos)
+        return 0
+
+    # DataObject
+    def Keyframe(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            return bool(self._tab.Get(flatbuffers.number_types.BoolFlags, o + self._tab.Pos))
+        return False
+
+    # DataObject
+    def Transform(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Float64Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 8))
+        return 0
+
+    # DataObject
+    def TransformAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Float64Flags, o)
+        return 0
+
+    # DataObject
+    def TransformLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # DataObject
+    def TransformIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        return o == 0
+
+    # DataObject
+    def PolyData(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 1))
+        return 0
+
+    # DataObject
+    def PolyDataAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Uint8Flags, o)
+        return 0
+
+    # DataObject
+    def PolyDataNestedRoot(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        if o != 0:
+            from Envelope.PolyData import PolyData
+            return PolyData.GetRootAs(self._tab.Bytes, self._tab.Vector(o))
+        return 0
+
+    # DataObject
+    def PolyDataLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # DataObject
+    def PolyDataIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        return o == 0
+
 def DataObjectStart(builder):
-    builder.StartObject(2)
+    builder.StartObject(6)
 
 def Start(builder):
     DataObjectStart(builder)
@@ -56,6 +132,51 @@ def DataObjectAddXml(builder, xml):
 def AddXml(builder, xml):
     DataObjectAddXml(builder, xml)
 
+def DataObjectAddTopologyId(builder, topologyId):
+    builder.PrependUint64Slot(2, topologyId, 0)
+
+def AddTopologyId(builder, topologyId):
+    DataObjectAddTopologyId(builder, topologyId)
+
+def DataObjectAddKeyframe(builder, keyframe):
+    builder.PrependBoolSlot(3, keyframe, 0)
+
+def AddKeyframe(builder, keyframe):
+    DataObjectAddKeyframe(builder, keyframe)
+
+def DataObjectAddTransform(builder, transform):
+    builder.PrependUOffsetTRelativeSlot(4, flatbuffers.number_types.UOffsetTFlags.py_type(transform), 0)
+
+def AddTransform(builder, transform):
+    DataObjectAddTransform(builder, transform)
+
+def DataObjectStartTransformVector(builder, numElems):
+    return builder.StartVector(8, numElems, 8)
+
+def StartTransformVector(builder, numElems):
+    return DataObjectStartTransformVector(builder, numElems)
+
+def DataObjectAddPolyData(builder, polyData):
+    builder.PrependUOffsetTRelativeSlot(5, flatbuffers.number_types.UOffsetTFlags.py_type(polyData), 0)
+
+def AddPolyData(builder, polyData):
+    DataObjectAddPolyData(builder, polyData)
+
+def DataObjectStartPolyDataVector(builder, numElems):
+    return builder.StartVector(1, numElems, 1)
+
+def StartPolyDataVector(builder, numElems):
+    return DataObjectStartPolyDataVector(builder, numElems)
+
+def DataObjectMakePolyDataVectorFromBytes(builder, bytes):
+    builder.StartVector(1, len(bytes), 1)
+    builder.head = builder.head - len(bytes)
+    builder.Bytes[builder.head : builder.head + len(bytes)] = bytes
+    return builder.EndVector()
+
+def MakePolyDataVectorFromBytes(builder, bytes):
+    return DataObjectMakePolyDataVectorFromBytes(builder, bytes)
+
 def DataObjectEnd(builder):
     return builder.EndObject()
 
@@ -0,0 +1,198 @@
+# automatically generated by the FlatBuffers compiler, do not modify
+
+# namespace: Envelope
+
+import flatbuffers
+from flatbuffers.compat import import_numpy
+np = import_numpy()
+
+class PolyData(object):
+    __slots__ = ['_tab']
+
+    @classmethod
+    def GetRootAs(cls, buf, offset=0):
+        n = flatbuffers.encode.Get(flatbuffers.packer.uoffset, buf, offset)
+        x = PolyData()
+        x.Init(buf, n + offset)
+        return x
+
+    @classmethod
+    def GetRootAsPolyData(cls, buf, offset=0):
+        """This method is deprecated. Please switch to GetRootAs."""
+        return cls.GetRootAs(buf, offset)
+    # PolyData
+    def Init(self, buf, pos):
+        self._tab = flatbuffers.table.Table(buf, pos)
+
+    # PolyData
+    def Points(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Float32Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return 0
+
+    # PolyData
+    def PointsAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Float32Flags, o)
+        return 0
+
+    # PolyData
+    def PointsLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # PolyData
+    def PointsIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        return o == 0
+
+    # PolyData
+    def Verts(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
+        if o != 0:
+            x = self._tab.Indirect(o + self._tab.Pos)
+            from Envelope.CellArray import CellArray
+            obj = CellArray()
+            obj.Init(self._tab.Bytes, x)
+            return obj
+        return None
+
+    # PolyData
+    def Lines(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        if o != 0:
+            x = self._tab.Indirect(o + self._tab.Pos)
+            from Envelope.CellArray import CellArray
+            obj = CellArray()
+            obj.Init(self._tab.Bytes, x)
+            return obj
+        return None
+
+    # PolyData
+    def Polys(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            x = self._tab.Indirect(o + self._tab.Pos)
+            from Envelope.CellArray import CellArray
+            obj = CellArray()
+            obj.Init(self._tab.Bytes, x)
+            return obj
+        return None
+
+    # PolyData
+    def Strips(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            x = self._tab.Indirect(o + self._tab.Pos)
+            from Envelope.CellArray import CellArray
+            obj = CellArray()
+            obj.Init(self._tab.Bytes, x)
+            return obj
+        return None
+
+    # PolyData
+    def Arrays(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        if o != 0:
+            x = self._tab.Vector(o)
+            x += flatbuffers.number_types.UOffsetTFlags.py_type(j) * 4
+            x = self._tab.Indirect(x)
+            from Envelope.DataArray import DataArray
+            obj = DataArray()
+            obj.Init(self._tab.Bytes, x)
+            return obj
+        return None
+
+    # PolyData
+    def ArraysLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # PolyData
+    def ArraysIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        return o == 0
+
+    # PolyData
+    def QuantizedPoints(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(16))
+        if o != 0:
+            x = self._tab.Indirect(o + self._tab.Pos)
+            from Envelope.DataArray import DataArray
+            obj = DataArray()
+            obj.Init(self._tab.Bytes, x)
+            return obj
+        return None
+
+def PolyDataStart(builder):
+    builder.StartObject(7)
+
+def Start(builder):
+    PolyDataStart(builder)
+
+def PolyDataAddPoints(builder, points):
+    builder.PrependUOffsetTRelativeSlot(0, flatbuffers.number_types.UOffsetTFlags.py_type(points), 0)
+
+def AddPoints(builder, points):
+    PolyDataAddPoints(builder, points)
+
+def PolyDataStartPointsVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartPointsVector(builder, numElems):
+    return PolyDataStartPointsVector(builder, numElems)
+
+def PolyDataAddVerts(builder, verts):
+    builder.PrependUOffsetTRelativeSlot(1, flatbuffers.number_types.UOffsetTFlags.py_type(verts), 0)
+
+def AddVerts(builder, verts):
+    PolyDataAddVerts(builder, verts)
+
+def PolyDataAddLines(builder, lines):
+    builder.PrependUOffsetTRelativeSlot(2, flatbuffers.number_types.UOffsetTFlags.py_type(lines), 0)
+
+def AddLines(builder, lines):
+    PolyDataAddLines(builder, lines)
+
+def PolyDataAddPolys(builder, polys):
+    builder.PrependUOffsetTRelativeSlot(3, flatbuffers.number_types.UOffsetTFlags.py_type(polys), 0)
+
+def AddPolys(builder, polys):
+    PolyDataAddPolys(builder, polys)
+
+def PolyDataAddStrips(builder, strips):
+    builder.PrependUOffsetTRelativeSlot(4, flatbuffers.number_types.UOffsetTFlags.py_type(strips), 0)
+
+def AddStrips(builder, strips):
+    PolyDataAddStrips(builder, strips)
+
+def PolyDataAddArrays(builder, arrays):
+    builder.PrependUOffsetTRelativeSlot(5, flatbuffers.number_types.UOffsetTFlags.py_type(arrays), 0)
+
+def AddArrays(builder, arrays):
+    PolyDataAddArrays(builder, arrays)
+
+def PolyDataStartArraysVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartArraysVector(builder, numElems):
+    return PolyDataStartArraysVector(builder, numElems)
+
+def PolyDataAddQuantizedPoints(builder, quantizedPoints):
+    builder.PrependUOffsetTRelativeSlot(6, flatbuffers.number_types.UOffsetTFlags.py_type(quantizedPoints), 0)
+
+def AddQuantizedPoints(builder, quantizedPoints):
+    PolyDataAddQuantizedPoints(builder, quantizedPoints)
+
+def PolyDataEnd(builder):
+    return builder.EndObject()
+
+def End(builder):
+    return PolyDataEnd(builder)
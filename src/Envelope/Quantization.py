@@ -0,0 +1,8 @@
+# automatically generated by the FlatBuffers compiler, do not modify
+
+# namespace: Envelope
+
+class Quantization(object):
+    Exact = 0
+    Linear = 1
+    Octahedral = 2
@@ -0,0 +1,155 @@
+import zlib
+import importlib
+import time
+import numpy as np
+import typing as t
+from dataclasses import dataclass
+from Envelope.Codec import Codec
+
+# compression of the array vectors of a PolyData payload, see DataArray in ForwardMessage.fbs
+# NOTE: lz4 and zstandard are optional (the "codecs" extra), they are only imported once an array uses them,
+#       parse_codecs rejects them up front when they are not installed
+
+@dataclass(frozen=True)
+class CodecSpec:
+  codec:int = Codec.Raw
+  level:int = 0 # 0: default level of the codec
+  shuffle:bool = False # byte shuffle the values first, helps float arrays a lot
+
+RAW = CodecSpec()
+CODEC_NAMES = {"raw": Codec.Raw, "zlib": Codec.Zlib, "lz4": Codec.LZ4, "zstd": Codec.Zstd}
+# modules of the optional codecs
+CODEC_MODULES = {Codec.LZ4: "lz4.block", Codec.Zstd: "zstandard"}
+
+# array name -> codec, "*" for every array not listed
+Codecs = t.Mapping[str,CodecSpec]
+
+# ValueError when the module of an optional codec can't be imported
+def check_codec(name:str):
+  module = CODEC_MODULES.get(CODEC_NAMES[name], None)
+  if module is None: return
+  try:
+    importlib.import_module(module)
+  except ImportError as e:
+    raise ValueError(f"codec {name} needs the {module.split('.')[0]} module, install the codecs extra: {e}") from e
+
+def codec_for(codecs:Codecs|None, name:str) -> CodecSpec:
+  if not codecs: return RAW
+  return codecs.get(name, codecs.get("*", RAW))
+
+# "[name=]codec[:level][+shuffle],...", e.g. "*=zstd:3+shuffle,Colors=lz4"
+def parse_codecs(text:str) -> t.Dict[str,CodecSpec]:
+  ret = {}
+  for item in filter(None, (s.strip() for s in text.split(","))):
+    name, _, spec = item.rpartition("=")
+    spec, _, shuffle = spec.partition("+")
+    codec, _, level = spec.partition(":")
+    if codec not in CODEC_NAMES: raise ValueError(f"unknown codec {codec}, expected one of {list(CODEC_NAMES)}")
+    if shuffle not in ("", "shuffle"): raise ValueError(f"unknown codec option {shuffle}")
+    check_codec(codec)
+    ret[name or "*"] = CodecSpec(CODEC_NAMES[codec], int(level or 0), shuffle == "shuffle")
+  return ret
+
+def format_codec(spec:CodecSpec) -> str:
+  name = next(k for k,v in CODEC_NAMES.items() if v == spec.codec)
+  return f"{name}{f':{spec.level}' if spec.level else ''}{'+shuffle' if spec.shuffle else ''}"
+
+# byte k of every value goes to plane k, so the slowly changing sign/exponent bytes end up next to each other
+def shuffle_bytes(data:np.ndarray, itemsize:int) -> np.ndarray:
+  if itemsize <= 1: return data
+  return np.ascontiguousarray(data.reshape(-1, itemsize).T).reshape(-1)
+
+def unshuffle_bytes(data:np.ndarray, itemsize:int) -> np.ndarray:
+  if itemsize <= 1: return data
+  return np.ascontiguousarray(data.reshape(itemsize, -1).T).reshape(-1)
+
+def compress(data:bytes|memoryview, codec:int, level:int) -> bytes:
+  if codec == Codec.Zlib:
+    return zlib.compress(data, level or zlib.Z_DEFAULT_COMPRESSION)
+  if codec == Codec.LZ4:
+    import lz4.block
+    # NOTE: the size is in the envelope, no need to store it in the block
+    if level > 0: return lz4.block.compress(data, mode="high_compression", compression=level, store_size=False)
+    return lz4.block.compress(data, store_size=False)
+  if codec == Codec.Zstd:
+    import zstandard
+    return zstandard.ZstdCompressor(level=level or 3).compress(data)
+  raise ValueError(f"unknown codec {codec}")
+
+def decompress(data:bytes|memoryview, codec:int, size:int) -> bytes:
+  if codec == Codec.Zlib:
+    return zlib.decompress(data, bufsize=max(size, 1))
+  if codec == Codec.LZ4:
+    import lz4.block
+    return lz4.block.decompress(data, uncompressed_size=size)
+  if codec == Codec.Zstd:
+    import zstandard
+    return zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+  raise ValueError(f"unknown codec {codec}")
+
+# bytes of the values of an array to store in DataArray.data, the raw bytes are returned as they are
+def encode(values:np.ndarray, spec:CodecSpec) -> np.ndarray:
+  data = np.ascontiguousarray(values).reshape(-1).view(np.uint8)
+  if spec.codec == Codec.Raw: return data
+  if spec.shuffle: data = shuffle_bytes(data, values.dtype.itemsize)
+  return np.frombuffer(compress(data, spec.codec, spec.level), dtype=np.uint8)
+
+# inverse of encode, returns the bytes of the values
+def decode(data:np.ndarray, codec:int, shuffle:bool, itemsize:int, size:int) -> np.ndarray:
+  if codec == Codec.Raw: return data
+  ret = np.frombuffer(decompress(data, codec, size), dtype=np.uint8)
+  if len(ret) != size: raise ValueError(f"corrupt array, {len(ret)} bytes decoded, {size} expected")
+  return unshuffle_bytes(ret, itemsize) if shuffle else ret
+
+BENCHMARK_CODECS = [
+  "raw", "zlib:1", "zlib:6", "zlib:1+shuffle", "zlib:6+shuffle", "lz4", "lz4:9", "lz4+shuffle", "lz4:9+shuffle",
+  "zstd:1", "zstd:3", "zstd:9", "zstd:1+shuffle", "zstd:3+shuffle", "zstd:9+shuffle",
+]
+
+# compression ratio against encode/decode time of the arrays the streaming pipeline sends, to pick codecs per link
+def benchmark(project_dir:str, fields:t.List[str], n_frames:int = 10):
+  from vtk.util import numpy_support
+  from reader.fluent_cff import FluentCFFReader
+  from surface import SurfaceExtractor, CellToPoint
+  from lut import lut_from_name, apply_lut, ColorMap
+  r = FluentCFFReader(share_topology=True)
+  r.read_project(project_dir, lazy=True, fields=fields)
+  surface = SurfaceExtractor()
+  cell_to_point = CellToPoint()
+  lut = lut_from_name("jet")
+  lut.SetValueRange((0,1))
+  color_map = ColorMap(lut)
+
+  # name -> values of every frame
+  arrays:t.Dict[str,t.List[np.ndarray]] = {}
+  n_frames = min(n_frames, len(r))
+  for index in range(n_frames):
+    polydata = cell_to_point(surface(r[index].dataset))
+    apply_lut(polydata, color_map, "VelocityMag")
+    point_data = polydata.GetPointData()
+    for i in range(point_data.GetNumberOfArrays()):
+      array = point_data.GetArray(i)
+      if array: arrays.setdefault(array.GetName(), []).append(numpy_support.vtk_to_numpy(array))
+
+  print(f"{project_dir}: {n_frames} frames, {polydata.GetNumberOfPoints()} points")
+  for name, frames in arrays.items():
+    size = sum(values.nbytes for values in frames)
+    print(f"  {name} ({frames[0].dtype}, {size/len(frames)/1024:.1f}kb/frame)")
+    for text in BENCHMARK_CODECS:
+      spec = parse_codecs(text)["*"]
+      encoded = []
+      begin_sec = time.perf_counter()
+      for values in frames: encoded.append(encode(values, spec))
+      encode_sec = time.perf_counter()-begin_sec
+      begin_sec = time.perf_counter()
+      for values, data in zip(frames, encoded):
+        decoded = decode(data, spec.codec, spec.shuffle, values.dtype.itemsize, values.nbytes)
+      decode_sec = time.perf_counter()-begin_sec
+      assert np.array_equal(decoded.view(values.dtype).reshape(values.shape), values), text
+      encoded_size = sum(len(data) for data in encoded)
+      print(f"    {text:>15}: ratio {size/encoded_size:6.2f}, encode {encode_sec*1000/len(frames):7.3f}ms ({size/encode_sec/(1<<20):7.1f}mb/s), "
+            f"decode {decode_sec*1000/len(frames):7.3f}ms ({size/decode_sec/(1<<20):7.1f}mb/s)")
+
+if __name__ == "__main__":
+  benchmark("./data/Fluent-result", ["SV_U", "SV_V", "VelocityMag"])
+  benchmark("./data/3D-Pipe", ["SV_U", "SV_V", "VelocityMag"])
@@ -1,5 +1,8 @@
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+import asyncio
 import vtk
 import typing as t
 
@@ -26,4 +29,48 @@ class Reader(ABC):
 
   @abstractmethod
   async def __anext__(self) -> Frame:
-    pass
\ No newline at end of file
+    pass
+
+# decodes up to `depth` frames ahead of the consumer on a worker pool
+# used by FluentCFFReader's async iteration and by the FrameScheduler of the streaming pipeline
+# NOTE: new work is only submitted when the consumer asks for the next frame,
+#       so a slow consumer stalls the decoding instead of piling up frames in memory
+# NOTE: close() ends the iteration, a later anext() stops instead of submitting to a shut down executor
+class FramePrefetcher:
+  def __init__(self, fetch:t.Callable[[int],Frame], indices:t.Iterable[int], depth:int, executor:Executor|None = None):
+    self.fetch = fetch
+    self.indices:t.Iterator[int] = iter(indices)
+    self.depth:int = max(depth, 0)
+    self.owns_executor:bool = executor is None
+    self.executor:Executor = executor or ThreadPoolExecutor(max_workers=max(self.depth, 1), thread_name_prefix="prefetch")
+    self.pending:deque[Future] = deque()
+    self.closed:bool = False
+
+  def __aiter__(self):
+    return self
+
+  async def __anext__(self) -> Frame:
+    if self.closed: raise StopAsyncIteration
+    self.fill()
+    if not self.pending:
+      self.close()
+      raise StopAsyncIteration
+    future = self.pending.popleft()
+    try:
+      return await asyncio.wrap_future(future)
+    except BaseException:
+      self.close()
+      raise
+
+  def fill(self):
+    # the frame being awaited plus `depth` frames ahead
+    while len(self.pending) < self.depth+1:
+      index = next(self.indices, None)
+      if index is None: break
+      self.pending.append(self.executor.submit(self.fetch, index))
+
+  def close(self):
+    self.closed = True
+    for future in self.pending: future.cancel()
+    self.pending.clear()
+    if self.owns_executor: self.executor.shutdown(wait=False, cancel_futures=True)
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import struct
 import warnings
 
 from . import compat
@@ -93,6 +94,25 @@ class EndVectorLengthMismatched(RuntimeError):
 
 # VtableMetadataFields is the count of metadata fields in each vtable.
 VtableMetadataFields = 2
+
+# Zeros for Pad, alignment padding is never wider than the widest scalar
+# unless the caller aligns to something big.
+_ZEROS = bytes(64)
+
+# Bound struct methods of the hot write path, looked up once.
+_PACK_INTO = {
+    flags: flags.packer_type.pack_into
+    for flags in (
+        N.BoolFlags, N.Uint8Flags, N.Uint16Flags, N.Uint32Flags, N.Uint64Flags,
+        N.Int8Flags, N.Int16Flags, N.Int32Flags, N.Int64Flags,
+        N.Float32Flags, N.Float64Flags,
+        N.UOffsetTFlags, N.SOffsetTFlags, N.VOffsetTFlags,
+    )
+}
+_packUOffset = packer.uoffset.pack_into
+_packSOffset = packer.soffset.pack_into
+_packVOffset = packer.voffset.pack_into
+_UOFFSET_MAX = N.UOffsetTFlags.max_val
 ## @endcond
 
 
@@ -130,6 +150,8 @@ class Builder(object):
       "finished",
       "vectorNumElems",
       "sharedStrings",
+      "external",
+      "externalBytes",
   )
 
   """Maximum buffer size constant, in bytes.
@@ -160,6 +182,8 @@ class Builder(object):
     self.nested = False
     self.forceDefaults = False
     self.sharedStrings = {}
+    self.external = []
+    self.externalBytes = 0
     ## @endcond
     self.finished = False
 
@@ -174,9 +198,20 @@ class Builder(object):
     self.forceDefaults = False
     self.sharedStrings = {}
     self.vectorNumElems = None
+    self.external = []
+    self.externalBytes = 0
     ## @endcond
     self.finished = False
 
+  def Reserve(self, additionalBytes):
+    """Reserve grows the buffer once so that `additionalBytes` more bytes
+
+    can be written without any further reallocation.
+    Use it before writing a payload of known size.
+    """
+    if self.head < additionalBytes:
+      self.growByteBuffer(len(self.Bytes) - self.head + additionalBytes)
+
   def Output(self):
     """Return the portion of the buffer that has been used for writing data.
 
@@ -192,8 +227,38 @@ class Builder(object):
     if not self.finished:
       raise BuilderNotFinishedError()
 
+    if self.external:
+      return b"".join(self.OutputChunks())
     return self.Bytes[self.Head() :]
 
+  def OutputChunks(self):
+    """Return the finished buffer as a list of memoryviews, in order.
+
+    Blobs added with `CreateExternalVector` are returned as views of the
+    original objects, the rest are views into the builder's buffer. Writing
+    the chunks in order (e.g. with `writer.writelines`) gives the same bytes
+    as `Output`. The views are valid until the builder is cleared or reused.
+    """
+
+    if not self.finished:
+      raise BuilderNotFinishedError()
+
+    view = memoryview(self.Bytes)
+    end = len(self.Bytes)
+    begin = self.Head()
+    chunks = []
+    # external blobs were recorded back to front, the last one is closest to head
+    for physicalOffset, blob in reversed(self.external):
+      split = end - physicalOffset
+      if split > begin:
+        chunks.append(view[begin:split])
+      if len(blob):
+        chunks.append(blob)
+      begin = split
+    if begin < end:
+      chunks.append(view[begin:end])
+    return chunks
+
   ## @cond FLATBUFFERS_INTERNAL
   def StartObject(self, numfields):
     """StartObject initializes bookkeeping for writing a new object."""
@@ -201,7 +266,7 @@ class Builder(object):
     self.assertNotNested()
 
     # use 32-bit offsets so that arithmetic doesn't overflow.
-    self.current_vtable = [0 for _ in range_func(numfields)]
+    self.current_vtable = [0] * numfields
     self.objectEnd = self.Offset()
     self.nested = True
 
@@ -250,42 +315,24 @@ class Builder(object):
     if vt2Offset is None:
       # Did not find a vtable, so write this one to the buffer.
 
-      # Write out the current vtable in reverse , because
-      # serialization occurs in last-first order:
-      i = len(self.current_vtable) - 1
-      trailing = 0
-      trim = True
-      while i >= 0:
-        off = 0
-        elem = self.current_vtable[i]
-        i -= 1
-
-        if elem == 0:
-          if trim:
-            trailing += 1
-            continue
-        else:
-          # Forward reference to field;
-          # use 32bit number to ensure no overflow:
-          off = objectOffset - elem
-          trim = False
-
-        self.PrependVOffsetT(off)
-
-      # The two metadata fields are written last.
-
-      # First, store the object bytesize:
+      # vtKey holds the field offsets last to first with the trailing
+      # defaults trimmed, the vtable is them first to last behind the
+      # two metadata fields: vtable bytesize and object bytesize.
       objectSize = UOffsetTFlags.py_type(objectOffset - self.objectEnd)
-      self.PrependVOffsetT(VOffsetTFlags.py_type(objectSize))
+      vBytes = (len(vtKey) + VtableMetadataFields) * N.VOffsetTFlags.bytewidth
+      vtable = (vBytes, objectSize) + vtKey[::-1]
+      for off in vtable:
+        N.enforce_number(off, N.VOffsetTFlags)
 
-      # Second, store the vtable bytesize:
-      vBytes = len(self.current_vtable) - trailing + VtableMetadataFields
-      vBytes *= N.VOffsetTFlags.bytewidth
-      self.PrependVOffsetT(VOffsetTFlags.py_type(vBytes))
+      # Serialization occurs in last-first order, so the whole vtable is
+      # placed in front of the object with a single write:
+      self.Prep(N.VOffsetTFlags.bytewidth, vBytes)
+      self.head = self.head - vBytes
+      struct.pack_into("<%dH" % len(vtable), self.Bytes, self.head, *vtable)
 
       # Next, write the offset to the new vtable in the
       # already-allocated SOffsetT at the beginning of this object:
-      objectStart = SOffsetTFlags.py_type(len(self.Bytes) - objectOffset)
+      objectStart = SOffsetTFlags.py_type(len(self.Bytes) - objectOffset + self.externalBytes)
       encode.Write(
           packer.soffset,
           self.Bytes,
@@ -298,7 +345,7 @@ class Builder(object):
       self.vtables[vtKey] = self.Offset()
     else:
       # Found a duplicate vtable.
-      objectStart = SOffsetTFlags.py_type(len(self.Bytes) - objectOffset)
+      objectStart = SOffsetTFlags.py_type(len(self.Bytes) - objectOffset + self.externalBytes)
       self.head = UOffsetTFlags.py_type(objectStart)
 
       # Write the offset to the found vtable in the
@@ -319,21 +366,28 @@ class Builder(object):
     self.nested = False
     return self.WriteVtable()
 
-  def growByteBuffer(self):
-    """Doubles the size of the byteslice, and copies the old data towards
+  def growByteBuffer(self, minSize=0):
+    """Grows the byteslice to at least double its size, or to `minSize`
 
-    the end of the new buffer (since we build the buffer backwards).
+    in one step, and copies the used data towards the end of the new buffer
+    (since we build the buffer backwards). Updates head accordingly.
     """
     if len(self.Bytes) == Builder.MAX_BUFFER_SIZE:
       msg = "flatbuffers: cannot grow buffer beyond 2 gigabytes"
       raise BuilderSizeError(msg)
+    if minSize > Builder.MAX_BUFFER_SIZE:
+      msg = "flatbuffers: cannot grow buffer beyond 2 gigabytes"
+      raise BuilderSizeError(msg)
 
-    newSize = min(len(self.Bytes) * 2, Builder.MAX_BUFFER_SIZE)
+    oldSize = len(self.Bytes)
+    newSize = min(max(oldSize * 2, minSize), Builder.MAX_BUFFER_SIZE)
     if newSize == 0:
       newSize = 1
     bytes2 = bytearray(newSize)
-    bytes2[newSize - len(self.Bytes) :] = self.Bytes
+    # only the written part needs to move
+    bytes2[newSize - (oldSize - self.head) :] = memoryview(self.Bytes)[self.head :]
     self.Bytes = bytes2
+    self.head = UOffsetTFlags.py_type(self.head + newSize - oldSize)
 
   ## @endcond
 
@@ -349,13 +403,16 @@ class Builder(object):
 
   ## @cond FLATBUFFERS_INTERNAL
   def Offset(self):
-    """Offset relative to the end of the buffer."""
-    return UOffsetTFlags.py_type(len(self.Bytes) - self.Head())
+    """Offset relative to the end of the buffer, external blobs included."""
+    return UOffsetTFlags.py_type(len(self.Bytes) - self.Head() + self.externalBytes)
 
   def Pad(self, n):
     """Pad places zeros at the current offset."""
-    for i in range_func(n):
-      self.Place(0, N.Uint8Flags)
+    if n <= 0:
+      return
+    head = self.head - n
+    self.Bytes[head : self.head] = _ZEROS[:n] if n <= len(_ZEROS) else bytes(n)
+    self.head = head
 
   def Prep(self, size, additionalBytes):
     """Prep prepares to write an element of `size` after `additional_bytes`
@@ -372,16 +429,17 @@ class Builder(object):
 
     # Find the amount of alignment needed such that `size` is properly
     # aligned after `additionalBytes`:
-    alignSize = (~(len(self.Bytes) - self.Head() + additionalBytes)) + 1
-    alignSize &= size - 1
-
-    # Reallocate the buffer if needed:
-    while self.Head() < alignSize + size + additionalBytes:
-      oldBufSize = len(self.Bytes)
-      self.growByteBuffer()
-      updated_head = self.head + len(self.Bytes) - oldBufSize
-      self.head = UOffsetTFlags.py_type(updated_head)
-    self.Pad(alignSize)
+    head = self.head
+    alignSize = -(len(self.Bytes) - head + self.externalBytes + additionalBytes) & (size - 1)
+
+    # Reallocate the buffer if needed, in one step:
+    needed = alignSize + size + additionalBytes
+    if head < needed:
+      self.growByteBuffer(len(self.Bytes) - head + needed)
+      head = self.head
+    if alignSize:
+      self.Bytes[head - alignSize : head] = _ZEROS[:alignSize] if alignSize <= len(_ZEROS) else bytes(alignSize)
+      self.head = head - alignSize
 
   def PrependSOffsetTRelative(self, off):
     """PrependSOffsetTRelative prepends an SOffsetT, relative to where it
@@ -391,11 +449,11 @@ class Builder(object):
 
     # Ensure alignment is already done:
     self.Prep(N.SOffsetTFlags.bytewidth, 0)
-    if not (off <= self.Offset()):
+    offset = len(self.Bytes) - self.head + self.externalBytes
+    if not (off <= offset):
       msg = "flatbuffers: Offset arithmetic error."
       raise OffsetArithmeticError(msg)
-    off2 = self.Offset() - off + N.SOffsetTFlags.bytewidth
-    self.PlaceSOffsetT(off2)
+    self.PlaceSOffsetT(offset - off + N.SOffsetTFlags.bytewidth)
 
   ## @endcond
 
@@ -407,11 +465,11 @@ class Builder(object):
 
     # Ensure alignment is already done:
     self.Prep(N.UOffsetTFlags.bytewidth, 0)
-    if not (off <= self.Offset()):
+    offset = len(self.Bytes) - self.head + self.externalBytes
+    if not (off <= offset):
       msg = "flatbuffers: Offset arithmetic error."
       raise OffsetArithmeticError(msg)
-    off2 = self.Offset() - off + N.UOffsetTFlags.bytewidth
-    self.PlaceUOffsetT(off2)
+    self.PlaceUOffsetT(offset - off + N.UOffsetTFlags.bytewidth)
 
   ## @cond FLATBUFFERS_INTERNAL
   def StartVector(self, elemSize, numElems, alignment):
@@ -542,12 +600,58 @@ class Builder(object):
     self.head = UOffsetTFlags.py_type(self.Head() - l)
     ## @endcond
 
-    # tobytes ensures c_contiguous ordering
-    self.Bytes[self.Head() : self.Head() + l] = x_lend.tobytes(order="C")
+    # copy straight from the array's memory, tobytes only for non-contiguous ones
+    if x_lend.flags.c_contiguous:
+      self.Bytes[self.Head() : self.Head() + l] = memoryview(x_lend).cast("B")
+    else:
+      self.Bytes[self.Head() : self.Head() + l] = x_lend.tobytes(order="C")
 
     self.vectorNumElems = x.size
     return self.EndVector()
 
+  def CreateExternalVector(self, x, alignment=1):
+    """CreateExternalVector references a blob as vector data without copying it.
+
+    `x` is a bytes-like object or a contiguous little-endian numpy array.
+    Only the vector's length and alignment are written into the buffer, the
+    blob itself is emitted as its own chunk by `OutputChunks` and must stay
+    unmodified until the output has been written. `Output` still works but
+    joins everything into one bytes object.
+    """
+
+    if np is not None and isinstance(x, np.ndarray):
+      if x.ndim > 1:
+        raise TypeError("multidimensional-ndarray passed to CreateExternalVector")
+      if x.dtype.str[0] == ">" or not x.flags.c_contiguous:
+        raise TypeError("CreateExternalVector needs a contiguous little-endian array")
+      numElems = x.size
+      alignment = max(alignment, x.dtype.alignment)
+      blob = memoryview(x).cast("B")
+    else:
+      blob = memoryview(x).cast("B")
+      numElems = len(blob)
+    l = len(blob)
+
+    # same alignment as StartVector, but only the padding and the length
+    # prefix need room in the buffer
+    self.assertNotNested()
+    size = max(alignment, N.Uint32Flags.bytewidth)
+    if size > self.minalign:
+      self.minalign = size
+    alignSize = ((~(self.Offset() + l)) + 1) & (size - 1)
+    needed = alignSize + N.Uint32Flags.bytewidth
+    if self.Head() < needed:
+      self.growByteBuffer(len(self.Bytes) - self.Head() + needed)
+    self.Pad(alignSize)
+
+    ## @cond FLATBUFFERS_INTERNAL
+    self.nested = True
+    self.vectorNumElems = numElems
+    self.externalBytes += l
+    self.external.append((len(self.Bytes) - self.Head(), blob))
+    ## @endcond
+    return self.EndVector()
+
   ## @cond FLATBUFFERS_INTERNAL
   def assertNested(self):
     """Check that we are in the process of building an object."""
@@ -585,7 +689,7 @@ class Builder(object):
     buffer.
     """
     self.assertNested()
-    self.current_vtable[slotnum] = self.Offset()
+    self.current_vtable[slotnum] = len(self.Bytes) - self.head + self.externalBytes
 
   ## @endcond
 
@@ -613,7 +717,7 @@ class Builder(object):
 
     self.PrependUOffsetTRelative(rootTable)
     if sizePrefix:
-      size = len(self.Bytes) - self.Head()
+      size = self.Offset()
       N.enforce_number(size, N.Int32Flags)
       self.PrependInt32(size)
     self.finished = True
@@ -633,7 +737,9 @@ class Builder(object):
   ## @cond FLATBUFFERS_INTERNAL
   def Prepend(self, flags, off):
     self.Prep(flags.bytewidth, 0)
-    self.Place(off, flags)
+    N.enforce_number(off, flags)
+    self.head = self.head - flags.bytewidth
+    _PACK_INTO[flags](self.Bytes, self.head, off)
 
   def PrependSlot(self, flags, o, x, d):
     if x is not None:
@@ -641,7 +747,9 @@ class Builder(object):
     if d is not None:
       N.enforce_number(d, flags)
     if x != d or (self.forceDefaults and d is not None):
-      self.Prepend(flags, x)
+      self.Prep(flags.bytewidth, 0)
+      self.head = self.head - flags.bytewidth
+      _PACK_INTO[flags](self.Bytes, self.head, x)
       self.Slot(o)
 
   def PrependBoolSlot(self, *args):
@@ -812,7 +920,7 @@ class Builder(object):
 
     N.enforce_number(x, flags)
     self.head = self.head - flags.bytewidth
-    encode.Write(flags.packer_type, self.Bytes, self.Head(), x)
+    _PACK_INTO[flags](self.Bytes, self.head, x)
 
   def PlaceVOffsetT(self, x):
     """PlaceVOffsetT prepends a VOffsetT to the Builder, without checking
@@ -821,7 +929,7 @@ class Builder(object):
     """
     N.enforce_number(x, N.VOffsetTFlags)
     self.head = self.head - N.VOffsetTFlags.bytewidth
-    encode.Write(packer.voffset, self.Bytes, self.Head(), x)
+    _packVOffset(self.Bytes, self.head, x)
 
   def PlaceSOffsetT(self, x):
     """PlaceSOffsetT prepends a SOffsetT to the Builder, without checking
@@ -830,16 +938,17 @@ class Builder(object):
     """
     N.enforce_number(x, N.SOffsetTFlags)
     self.head = self.head - N.SOffsetTFlags.bytewidth
-    encode.Write(packer.soffset, self.Bytes, self.Head(), x)
+    _packSOffset(self.Bytes, self.head, x)
 
   def PlaceUOffsetT(self, x):
     """PlaceUOffsetT prepends a UOffsetT to the Builder, without checking
 
     for space.
     """
-    N.enforce_number(x, N.UOffsetTFlags)
+    if not 0 <= x <= _UOFFSET_MAX:
+      N.enforce_number(x, N.UOffsetTFlags)
     self.head = self.head - N.UOffsetTFlags.bytewidth
-    encode.Write(packer.uoffset, self.Bytes, self.Head(), x)
+    _packUOffset(self.Bytes, self.head, x)
 
   ## @endcond
 
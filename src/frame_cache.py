@@ -0,0 +1,73 @@
+import os
+import json
+import mmap
+import hashlib
+import typing as t
+from threading import Lock
+
+# content addressed on-disk store of serialized frame payloads
+# key = hash(identity of every input file, fingerprint of the pipeline settings)
+# file identity is (mtime, size, sha256), hashes are remembered in index.json so unchanged files are not re-hashed
+class FrameCache:
+  def __init__(self, cache_dir:str):
+    self.cache_dir:str = cache_dir
+    self.index_file:str = os.path.join(cache_dir, "index.json")
+    self.lck = Lock()
+    os.makedirs(cache_dir, exist_ok=True)
+    self.file_hashes:t.Dict[str,t.List] = {}
+    try:
+      with open(self.index_file, "r") as f:
+        self.file_hashes = json.load(f)
+    except (OSError, ValueError):
+      self.file_hashes = {}
+
+  def file_identity(self, path:str) -> t.Tuple[int,int,str]:
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    with self.lck:
+      entry = self.file_hashes.get(path, None)
+      if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+        return (entry[0], entry[1], entry[2])
+    with open(path, "rb") as f:
+      digest = hashlib.file_digest(f, "sha256").hexdigest()
+    with self.lck:
+      self.file_hashes[path] = [st.st_mtime_ns, st.st_size, digest]
+    return (st.st_mtime_ns, st.st_size, digest)
+
+  def key(self, files:t.Sequence[str], settings:t.Dict[str,t.Any]) -> str:
+    h = hashlib.sha256()
+    for path in files:
+      mtime, size, digest = self.file_identity(path)
+      h.update(f"{mtime}:{size}:{digest};".encode())
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()
+
+  def path(self, key:str) -> str:
+    return os.path.join(self.cache_dir, key[:2], key)
+
+  # NOTE: returns a read-only view over a memory-mapped file, valid as long as the view is referenced
+  def get(self, key:str) -> memoryview|None:
+    try:
+      with open(self.path(key), "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0: return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+      return None
+    return memoryview(mm)
+
+  def put(self, key:str, payload:bytes|str):
+    if isinstance(payload, str): payload = payload.encode()
+    path = self.path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write then rename, readers never see a partial payload
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+      f.write(payload)
+    os.replace(tmp, path)
+
+  def flush(self):
+    with self.lck:
+      tmp = f"{self.index_file}.{os.getpid()}.tmp"
+      with open(tmp, "w") as f:
+        json.dump(self.file_hashes, f)
+      os.replace(tmp, self.index_file)
@@ -1,19 +1,132 @@
+import os
 import vtk
-import matplotlib.cm as cm
 import random
+import numpy as np
+from threading import Lock
+from vtk.util import numpy_support
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+import typing as t
+
+# precomputed uint8 tables, see build_colormap_bundle
+COLORMAP_BUNDLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "colormaps.npz")
+BUNDLED_COLORMAPS = ["jet", "turbo", "rainbow", "viridis", "plasma", "inferno", "magma", "cividis", "coolwarm", "gray", "Accent"]
+BUNDLED_SIZES = [256, 512]
+
+# (n,4) uint8 tables by name and size, read lazily from the bundle, matplotlib only for maps/sizes that are not bundled
+class ColormapRegistry:
+  def __init__(self, bundle:str = COLORMAP_BUNDLE):
+    self.bundle_path:str = bundle
+    self.bundle:np.lib.npyio.NpzFile|None = None
+    self.tables:t.Dict[t.Tuple[str,int],np.ndarray] = {}
+    self.luts:t.Dict[t.Tuple[str,int],vtk.vtkLookupTable] = {}
+    self.lck = Lock()
+
+  def table(self, name:str, n:int) -> np.ndarray:
+    with self.lck:
+      table = self.tables.get((name, n), None)
+      if table is not None: return table
+      key = f"{name}_{n}"
+      if self.bundle is None and os.path.exists(self.bundle_path):
+        self.bundle = np.load(self.bundle_path)
+      if self.bundle is not None and key in self.bundle.files:
+        table = self.bundle[key]
+      else:
+        table = table_from_matplotlib(name, n)
+      self.tables[(name, n)] = table
+      return table
+
+  # NOTE: hands out a copy of the memoized table, callers set ranges on it
+  def lut(self, name:str, n:int) -> vtk.vtkLookupTable:
+    with self.lck:
+      lut = self.luts.get((name, n), None)
+    if lut is None:
+      lut = vtk.vtkLookupTable()
+      lut.SetNumberOfTableValues(n)
+      lut.SetTable(numpy_support.numpy_to_vtk(self.table(name, n), deep=True, array_type=vtk.VTK_UNSIGNED_CHAR))
+      lut.Build()
+      with self.lck:
+        self.luts[(name, n)] = lut
+    ret = vtk.vtkLookupTable()
+    ret.DeepCopy(lut)
+    return ret
+
+colormaps = ColormapRegistry()
+
+# same colors as vtkLookupTable.SetTableValue(i, *cmap(i/(n-1)))
+def table_from_matplotlib(name:str, n:int) -> np.ndarray:
+  import matplotlib
+  cmap = matplotlib.colormaps[name].resampled(n)
+  return (cmap(np.arange(n)/(n-1))*255.0+0.5).astype(np.uint8)
+
+# regenerates the bundle, only needed when BUNDLED_COLORMAPS or BUNDLED_SIZES change
+def build_colormap_bundle(path:str = COLORMAP_BUNDLE):
+  tables = {f"{name}_{n}": table_from_matplotlib(name, n) for name in BUNDLED_COLORMAPS for n in BUNDLED_SIZES}
+  np.savez_compressed(path, **tables)
 
 def lut_from_name(cmap_name:str, n=512) -> vtk.vtkLookupTable:
-  cmap = cm.get_cmap(cmap_name, n)
-  lut = vtk.vtkLookupTable()
-  lut.SetNumberOfTableValues(n)
-  for i in range(n):
-    r,g,b,a = cmap(i/(n-1))
-    lut.SetTableValue(i, r,g,b,a)
-  lut.Build()
-  return lut
+  return colormaps.lut(cmap_name, n)
+
+# numpy replacement of vtkLookupTable.MapScalars for the linear scale, same colors bit for bit, see test/test_lut.py
+# the (n,4) uint8 table is taken once from the lookup table, values are mapped with one clip/scale/take
+# alpha: None drops the alpha channel when it is constant over the table, False always drops it, True keeps it
+# NOTE: every call returns a new color array, only the index scratch buffers are reused between calls
+class ColorMap:
+  def __init__(self, lut:vtk.vtkLookupTable, alpha:bool|None = None, n_threads:int = 1, chunk_size:int = 1<<18):
+    lut.Build()
+    n = lut.GetNumberOfTableValues()
+    self.table:np.ndarray = numpy_support.vtk_to_numpy(lut.GetTable())[:n].copy()
+    nan_color = np.clip(np.array(lut.GetNanColor(), dtype=np.float64), 0, 1)
+    self.nan_color:np.ndarray = (nan_color*255.0+0.5).astype(np.uint8)
+    if alpha is None: alpha = not np.all(self.table[:,3] == self.table[0,3])
+    if not alpha:
+      self.table = np.ascontiguousarray(self.table[:,:3])
+      self.nan_color = self.nan_color[:3]
+    self.n_components:int = self.table.shape[1]
+    self.chunk_size:int = chunk_size
+    self.executor:ThreadPoolExecutor|None = ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix="lut") if n_threads > 1 else None
+    self.index:np.ndarray|None = None
+    self.index_int:np.ndarray|None = None
+    self.nan:np.ndarray|None = None
+
+  def map(self, values:np.ndarray, rng:tuple[float,float]) -> np.ndarray:
+    n = len(values)
+    # NOTE: a fresh array, apply_lut wraps it without copying and earlier frames may still be queued or cached
+    out = np.empty((n, self.n_components), dtype=np.uint8)
+    if self.index is None or len(self.index) != n:
+      self.index = np.empty(n, dtype=np.float64)
+      self.index_int = np.empty(n, dtype=np.intp)
+      self.nan = np.empty(n, dtype=np.bool_)
+    if self.executor and n > self.chunk_size:
+      bounds = range(0, n, self.chunk_size)
+      list(self.executor.map(lambda begin: self.map_range(values, rng, out, begin, min(begin+self.chunk_size, n)), bounds))
+    else:
+      self.map_range(values, rng, out, 0, n)
+    return out
+
+  def map_range(self, values:np.ndarray, rng:tuple[float,float], out:np.ndarray, begin:int, end:int):
+    assert self.index is not None and self.index_int is not None and self.nan is not None
+    n_colors = len(self.table)
+    # NOTE: same shift and scale as vtkLookupTable, below/above range values clamp to the first/last color
+    scale = n_colors/(rng[1]-rng[0]) if rng[1] > rng[0] else np.finfo(np.float64).max
+    index = self.index[begin:end]
+    index_int = self.index_int[begin:end]
+    out = out[begin:end]
+    # NOTE: widen to double first like vtk, float32 values minus a python float would be computed in float32
+    #       and land one color off at bin edges
+    np.copyto(index, values[begin:end])
+    np.subtract(index, rng[0], out=index)
+    # NOTE: an empty range scales by DBL_MAX like vtk, values above it overflow to inf and clamp to the last color
+    with np.errstate(over="ignore"): np.multiply(index, scale, out=index)
+    np.clip(index, 0, n_colors-1, out=index)
+    nan = np.isnan(index, out=self.nan[begin:end])
+    has_nan = nan.any()
+    if has_nan: index[nan] = 0
+    np.copyto(index_int, index, casting="unsafe")
+    np.take(self.table, index_int, axis=0, out=out)
+    if has_nan: out[nan] = self.nan_color
 
-def apply_lut(mesh:vtk.vtkPolyData, lut:vtk.vtkLookupTable, scalar:str|None = None) -> int:
+def apply_lut(mesh:vtk.vtkPolyData, lut:vtk.vtkLookupTable|ColorMap, scalar:str|None = None) -> int:
   point_data = mesh.GetPointData()
   array:vtk.vtkFloatArray
   if scalar:
@@ -23,6 +136,12 @@ def apply_lut(mesh:vtk.vtkPolyData, lut:vtk.vtkLookupTable, scalar:str|None = No
 
   if not array: return 0
   rng = array.GetRange()
+  if isinstance(lut, ColorMap):
+    colors = lut.map(numpy_support.vtk_to_numpy(array), rng)
+    color_array = numpy_support.numpy_to_vtk(colors, deep=False, array_type=vtk.VTK_UNSIGNED_CHAR)
+    color_array.SetName("Colors")
+    point_data.AddArray(color_array)
+    return 1
   lut.SetTableRange(rng)
   color_array = lut.MapScalars(array, vtk.VTK_COLOR_MODE_DEFAULT, -1)
   color_array.SetName("Colors")
@@ -1,21 +1,35 @@
+import os
 import vtk
+import numpy as np
 import struct
+import hashlib
 import asyncio
 import time
 import argparse
+import multiprocessing
 import websockets
 from dataclasses import dataclass
-from core import Reader
+from contextlib import aclosing
+from threading import Lock, local
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from core import Reader, FramePrefetcher
 import typing as t
 from reader.fluent_cff import FluentCFFReader
 from Envelope import ForwardMessage, DataObject, Information, PipelineInformation
-from lut import lut_from_name, apply_lut, default_lut
+from lut import lut_from_name, apply_lut, default_lut, ColorMap
+from frame_cache import FrameCache
+from surface import SurfaceExtractor, CellToPoint
+from poly_data import poly_data_from_vtk_mesh
+from codec import Codecs, parse_codecs, format_codec
+from quantize import Quantizations, parse_quantizations, format_quantization
 import flatbuffers
 
-FORMAT_VERSION = "0.0.1"
+FORMAT_VERSION = "0.0.2"
 # HOST = "10.0.0.243"
 HOST = "127.0.0.1"
 PORT = 8080
+# cell arrays the streaming pipeline uses, everything else in the dat files is skipped by the reader
+FIELDS = ["SV_U", "SV_V", "VelocityMag"]
 
 ################################
 ## Message
@@ -24,16 +38,40 @@ PORT = 8080
 class FrameInfo:
   index:int
   timestep:float
-  xml:str
+  # finished PolyData buffer, see poly_data.py
+  # NOTE: cache hits are views of the memory-mapped cache file, they stay mapped as long as the frame is referenced
+  poly_data:bytes|memoryview
+  # delta stream, see DataObject in ForwardMessage.fbs
+  topology_id:int = 0
+  keyframe:bool = False
+  transform:t.List[float]|None = None
 
 @dataclass
 class MessageRecipe:
   total_frame_count:int
   frames:t.List[FrameInfo]
 
-def cooke_message(msg_id:int, recipe:MessageRecipe) -> bytes:
-  builder = flatbuffers.Builder(1024)
+# how long the sender may hold frames back to pack them into one message
+# max_delay_sec = 0 sends every frame on its own
+@dataclass
+class BatchPolicy:
+  max_bytes:int = 1<<20
+  max_delay_sec:float = 0.02
+
+# websocket transport of mock_ws
+# fragment_size: bytes per websocket frame of a message, 0 sends every message as one frame
+# deflate: offer permessage-deflate, rarely worth it for float arrays and costs a compression pass per message
+@dataclass
+class WsOptions:
+  fragment_size:int = 1<<18
+  deflate:bool = False
+
+# upper bound of the serialized size of a message, to size the builder once
+def message_size_hint(recipe:MessageRecipe, external:bool = False) -> int:
+  payload = 0 if external else sum(len(frame.poly_data)+8 for frame in recipe.frames)
+  return 256 + 256*len(recipe.frames) + payload
 
+def build_message(builder:flatbuffers.Builder, msg_id:int, recipe:MessageRecipe, external:bool = False):
   # build pipeline information
   PipelineInformation.Start(builder)
   PipelineInformation.AddFrameCount(builder, recipe.total_frame_count)
@@ -42,10 +80,22 @@ def cooke_message(msg_id:int, recipe:MessageRecipe) -> bytes:
   frame_infos = []
   for frame in recipe.frames:
     type_str = builder.CreateString("PolyData") # TODO: support other types, do we really need this?
-    xml_str = builder.CreateString(frame.xml)
+    # NOTE: the nested buffer has to stay 8 byte aligned within the message
+    if external:
+      poly_data = builder.CreateExternalVector(frame.poly_data, 8)
+    else:
+      builder.Prep(8, len(frame.poly_data))
+      poly_data = DataObject.MakePolyDataVectorFromBytes(builder, frame.poly_data)
+    transform = None
+    if frame.transform is not None:
+      transform = builder.CreateNumpyVector(np.asarray(frame.transform, dtype=np.float64))
     DataObject.Start(builder)
     DataObject.AddType(builder, type_str)
-    DataObject.AddXml(builder, xml_str)
+    DataObject.AddPolyData(builder, poly_data)
+    if frame.topology_id:
+      DataObject.AddTopologyId(builder, frame.topology_id)
+      DataObject.AddKeyframe(builder, frame.keyframe)
+    if transform is not None: DataObject.AddTransform(builder, transform)
     data_object = DataObject.End(builder)
     
     Information.Start(builder)
@@ -56,7 +106,7 @@ def cooke_message(msg_id:int, recipe:MessageRecipe) -> bytes:
     frame_infos.append(frame_info)
 
   ForwardMessage.StartInformationsVector(builder, len(frame_infos))
-  for frame_info in frame_infos:
+  for frame_info in reversed(frame_infos):
     builder.PrependUOffsetTRelative(frame_info)
   informations = builder.EndVector()
 
@@ -69,8 +119,81 @@ def cooke_message(msg_id:int, recipe:MessageRecipe) -> bytes:
   msg = ForwardMessage.End(builder)
 
   builder.Finish(msg)
-  ret = builder.Output()
-  return bytes(ret)
+
+def cooke_message(msg_id:int, recipe:MessageRecipe) -> bytes:
+  builder = flatbuffers.Builder(message_size_hint(recipe))
+  build_message(builder, msg_id, recipe)
+  # NOTE: one copy out of the builder, Output() would slice a copy first
+  return bytes(memoryview(builder.Bytes)[builder.Head():])
+
+# websocket fragments of a message: chunks smaller than a quarter fragment (the table region) are coalesced,
+# larger ones are sliced without copying, so the first frame goes out before the rest is framed
+def message_fragments(chunks:t.Iterable[memoryview], fragment_size:int) -> t.Iterator[memoryview|bytearray]:
+  small = bytearray()
+  for chunk in chunks:
+    if len(chunk) < fragment_size//4:
+      small += chunk
+      if len(small) < fragment_size: continue
+    if small:
+      yield small
+      small = bytearray()
+    if len(chunk) < fragment_size//4: continue
+    for begin in range(0, len(chunk), fragment_size):
+      yield chunk[begin:begin+fragment_size]
+  if small: yield small
+
+# builders kept across messages, grown to the largest message seen so far
+# NOTE: in steady state cooking a message allocates no buffer at all, frame payloads are built in the pool
+#       of their FramePipeline the same way and copied out once, the payload bytes are the only per-frame buffer
+class BuilderPool:
+  def __init__(self, max_free:int = 4, initial_size:int = 1024):
+    self.max_free:int = max_free
+    self.high_water:int = initial_size
+    self.free:t.List[flatbuffers.Builder] = []
+    self.lck = Lock()
+
+  def acquire(self, size_hint:int = 0) -> flatbuffers.Builder:
+    with self.lck:
+      builder = self.free.pop() if self.free else None
+      size = max(self.high_water, size_hint)
+    if builder is None: return flatbuffers.Builder(size)
+    builder.Clear()
+    builder.Reserve(size)
+    return builder
+
+  def release(self, builder:flatbuffers.Builder):
+    with self.lck:
+      self.high_water = max(self.high_water, len(builder.Bytes))
+      if len(self.free) < self.max_free: self.free.append(builder)
+
+# a finished message in a pooled builder, chunks are valid until release
+@dataclass
+class PooledMessage:
+  pool:BuilderPool
+  builder:flatbuffers.Builder|None
+  chunks:t.List[memoryview]
+
+  @property
+  def nbytes(self) -> int:
+    return sum(len(chunk) for chunk in self.chunks)
+
+  def release(self):
+    if self.builder is None: return
+    for chunk in self.chunks: chunk.release()
+    self.chunks = []
+    self.pool.release(self.builder)
+    self.builder = None
+
+  def __enter__(self): return self
+  def __exit__(self, *args): self.release()
+
+# cooke_message into a pooled builder, external: reference the frame payloads instead of copying them
+# NOTE: external chunks view the payloads of recipe, write them (ws.send, writer.writelines) before those change
+def cooke_pooled_message(pool:BuilderPool, msg_id:int, recipe:MessageRecipe, external:bool = False) -> PooledMessage:
+  builder = pool.acquire(message_size_hint(recipe, external))
+  build_message(builder, msg_id, recipe, external)
+  if external: return PooledMessage(pool, builder, builder.OutputChunks())
+  return PooledMessage(pool, builder, [memoryview(builder.Bytes)[builder.Head():]])
 
 ################################
 ## Mesh
@@ -181,10 +304,256 @@ def xml_from_vtk_mesh(mesh):
   # ret = ret.encode("utf8")
   return ret
 
-async def mock_ws(mesh_id:int, msg_id:int):
-  r = FluentCFFReader()
-  r.read_project("./data/Fluent-result")
-  # r.read_project("./data/3D-Pipe")
+# stable id of the geometry of a case file
+def topology_id(cas_file:str) -> int:
+  st = os.stat(cas_file)
+  digest = hashlib.blake2b(f"{os.path.abspath(cas_file)}:{st.st_mtime_ns}:{st.st_size}".encode(), digest_size=8).digest()
+  return int.from_bytes(digest, "little") or 1
+
+################################
+## Pipeline
+
+LUT_NAME = "jet"
+SCALAR = "VelocityMag"
+# arrays delta frames carry, everything else is only in the keyframe
+DELTA_ARRAYS = ["Colors", SCALAR]
+
+def frame_transform(transform:vtk.vtkTransform, frame_index:int):
+  # NOTE: the mesh turns 0.15 degree further every frame
+  transform.Identity()
+  transform.RotateX(0.15*(frame_index+1))
+
+def transform_matrix(transform:vtk.vtkTransform) -> t.List[float]:
+  matrix = transform.GetMatrix()
+  return [matrix.GetElement(i//4, i%4) for i in range(16)]
+
+# everything besides the input files that changes the bytes of a frame payload
+# NOTE: delta frames send the transform next to the payload, it's not part of it
+def pipeline_settings(transform:vtk.vtkTransform, lut:vtk.vtkLookupTable, color_map:ColorMap, delta:bool, keyframe:bool, codecs:Codecs|None,
+                      quantizations:Quantizations|None) -> t.Dict[str,t.Any]:
+  return {
+    "format_version": FORMAT_VERSION,
+    "transform": None if delta else transform_matrix(transform),
+    "delta": [keyframe, DELTA_ARRAYS] if delta else None,
+    "lut": LUT_NAME,
+    "lut_size": lut.GetNumberOfTableValues(),
+    "lut_value_range": list(lut.GetValueRange()),
+    "lut_components": color_map.n_components,
+    "scalar": SCALAR,
+    "fields": FIELDS,
+    "codecs": {name: format_codec(spec) for name, spec in (codecs or {}).items()},
+    "quantizations": {name: format_quantization(spec) for name, spec in (quantizations or {}).items()},
+  }
+
+# per-frame processing chain, surface -> transform -> cell to point -> lut -> PolyData payload
+# NOTE: every worker has its own, the operators and the color map keep buffers between frames
+class FramePipeline:
+  def __init__(self, delta:bool = False, codecs:Codecs|None = None, quantizations:Quantizations|None = None):
+    self.delta:bool = delta
+    self.codecs:Codecs|None = codecs
+    self.quantizations:Quantizations|None = quantizations
+    self.transform = vtk.vtkTransform()
+    self.transform_filter = vtk.vtkTransformPolyDataFilter()
+    self.transform_filter.SetTransform(self.transform)
+    # "viridis", "plasma", "inferno", "magma", "coolwarm"…
+    # high contrast: turbo, jet, Accent
+    self.lut = lut_from_name(LUT_NAME)
+    self.lut.SetValueRange((0,1))
+    # lut = default_lut(rng, 256*4)
+    self.color_map = ColorMap(self.lut)
+    # NOTE: the boundary of the case mesh and its point-from-cell operator are built once,
+    #       later frames only gather and interpolate their cell data
+    self.surface = SurfaceExtractor()
+    self.cell_to_point = CellToPoint()
+    # NOTE: payloads are built in a reused builder, one pipeline runs one frame at a time
+    self.pool = BuilderPool(max_free=1)
+
+  def settings(self, index:int, keyframe:bool) -> t.Dict[str,t.Any]:
+    frame_transform(self.transform, index)
+    return pipeline_settings(self.transform, self.lut, self.color_map, self.delta, keyframe, self.codecs, self.quantizations)
+
+  def __call__(self, dataset:vtk.vtkUnstructuredGrid, index:int, keyframe:bool) -> bytes:
+    begin_sec = time.perf_counter()
+    polydata = self.surface(dataset)
+
+    if not self.delta:
+      frame_transform(self.transform, index)
+      self.transform_filter.SetInputData(polydata)
+      self.transform_filter.Update()
+      polydata = self.transform_filter.GetOutput(0)
+
+    polydata = self.cell_to_point(polydata)
+    apply_lut(polydata, self.color_map, SCALAR)
+
+    errors:t.Dict[str,float] = {}
+    builder = self.pool.acquire()
+    try:
+      if self.delta and not keyframe:
+        payload = poly_data_from_vtk_mesh(polydata, DELTA_ARRAYS, geometry=False, codecs=self.codecs, quantizations=self.quantizations, errors=errors, builder=builder)
+      else:
+        payload = poly_data_from_vtk_mesh(polydata, codecs=self.codecs, quantizations=self.quantizations, errors=errors, builder=builder)
+    finally:
+      self.pool.release(builder)
+    print(f"processed {index} {(time.perf_counter()-begin_sec)*1000:.4}ms{''.join(f', {name} error {error:.3g}' for name, error in errors.items())}")
+    return payload
+
+# how frames are looked up in the cache and processed
+# workers: frames processed at the same time, kind: "thread" (vtk and numpy release the GIL) or "process"
+# window: frames in flight ahead of the consumer, they are handed out in frame order
+@dataclass
+class WorkerPolicy:
+  workers:int = 1
+  kind:str = "thread"
+  window:int = 8
+
+# state of a process worker, see init_process_worker
+process_worker:t.Tuple[FluentCFFReader,FramePipeline]|None = None
+
+def init_process_worker(project_dir:str, fields:t.List[str]|None, delta:bool, codecs:Codecs|None, quantizations:Quantizations|None):
+  global process_worker
+  r = FluentCFFReader(share_topology=True)
+  r.read_project(project_dir, lazy=True, fields=fields)
+  process_worker = (r, FramePipeline(delta, codecs, quantizations))
+
+def process_frame_in_worker(keyframes:t.Sequence[bool], index:int) -> bytes:
+  assert process_worker is not None
+  r, pipeline = process_worker
+  return pipeline(r[index].dataset, index, keyframes[index])
+
+# runs FramePipeline on a pool, every thread or process reads and processes whole frames on its own
+# cache: frames are looked up on the pool too, the key of a frame hashes its input files (see FrameCache.file_identity)
+#        only once the frame is in the window, never for the whole project before the first frame
+# NOTE: fetches always run on threads of this process, with kind "process" they wait on a process pool for misses
+class FrameScheduler:
+  def __init__(self, r:FluentCFFReader, policy:WorkerPolicy, keyframes:t.Sequence[bool], delta:bool,
+               codecs:Codecs|None, quantizations:Quantizations|None, cache:FrameCache|None = None):
+    self.r = r
+    self.policy:WorkerPolicy = policy
+    self.keyframes:t.Sequence[bool] = keyframes
+    self.pipeline_args = (delta, codecs, quantizations)
+    self.cache:FrameCache|None = cache
+    self.local = local()
+    self.executor:Executor|None = None
+    self.process_executor:Executor|None = None
+    self.lck = Lock()
+    self.hits:int = 0
+
+  def start(self) -> Executor:
+    workers = max(self.policy.workers, 1)
+    if self.policy.kind == "process":
+      # NOTE: spawn, forking the event loop and the reader's threads is not safe
+      self.process_executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=init_process_worker,
+        initargs=(self.r.project_dir, None if self.r.fields is None else sorted(self.r.fields), *self.pipeline_args))
+    self.executor = ThreadPoolExecutor(workers, thread_name_prefix="frame")
+    return self.executor
+
+  def pipeline(self) -> FramePipeline:
+    pipeline = getattr(self.local, "pipeline", None)
+    if pipeline is None: pipeline = self.local.pipeline = FramePipeline(*self.pipeline_args)
+    return pipeline
+
+  # cached payload of a frame, or a new one that goes into the cache
+  def fetch(self, index:int) -> bytes|memoryview:
+    pipeline = self.pipeline()
+    key = None
+    if self.cache:
+      key = self.cache.key(self.r.frame_files(index), pipeline.settings(index, self.keyframes[index]))
+      payload = self.cache.get(key)
+      if payload is not None:
+        with self.lck: self.hits += 1
+        return payload
+    if self.process_executor:
+      payload = self.process_executor.submit(process_frame_in_worker, self.keyframes, index).result()
+    else:
+      payload = pipeline(self.r[index].dataset, index, self.keyframes[index])
+    if self.cache and key is not None: self.cache.put(key, payload)
+    return payload
+
+  # payloads of indices in order, at most window+1 in flight
+  def payloads(self, indices:t.Iterable[int]) -> FramePrefetcher:
+    return FramePrefetcher(self.fetch, indices, self.policy.window, self.executor or self.start())
+
+  def close(self):
+    for executor in (self.executor, self.process_executor):
+      if executor: executor.shutdown(wait=False, cancel_futures=True)
+    self.executor = self.process_executor = None
+
+# yields the serialized payload of every frame, in order
+# NOTE: frames found in the cache are streamed from disk and never decoded
+# delta: the first frame of every topology is a keyframe with the untransformed geometry,
+#        the others only carry DELTA_ARRAYS, the transform is sent as a matrix next to the payload
+# codecs: compression of the arrays by name, see codec.py
+# quantizations: arrays and points to send as integers, see quantize.py
+# workers: frames are looked up and processed on a pool, see WorkerPolicy and FrameScheduler
+async def frame_payloads(r:FluentCFFReader, cache:FrameCache|None = None, delta:bool = False, codecs:Codecs|None = None,
+                         quantizations:Quantizations|None = None, workers:WorkerPolicy = WorkerPolicy()) -> t.AsyncIterator[FrameInfo]:
+  transform = vtk.vtkTransform()
+  n_frames = len(r)
+  topology_ids = [topology_id(r.frame_files(index)[0]) if delta else 0 for index in range(n_frames)]
+  keyframes = [delta and (index == 0 or topology_ids[index] != topology_ids[index-1]) for index in range(n_frames)]
+
+  scheduler = FrameScheduler(r, workers, keyframes, delta, codecs, quantizations, cache)
+  payloads = scheduler.payloads(range(n_frames))
+  try:
+    for index in range(n_frames):
+      frame_transform(transform, index)
+      matrix = transform_matrix(transform) if delta else None
+      payload = await anext(payloads)
+      yield FrameInfo(index, r.frame_time(index), payload, topology_ids[index], keyframes[index], matrix)
+  finally:
+    payloads.close()
+    scheduler.close()
+    if cache:
+      cache.flush()
+      print(f"frame cache: {scheduler.hits}/{n_frames} hits")
+
+# groups frames into batches, a batch is sent once adding the next frame would exceed max_bytes
+# or max_delay_sec have passed since its first frame, whatever comes first
+# NOTE: a frame larger than max_bytes is sent alone
+async def batch_frames(frames:t.AsyncGenerator[FrameInfo,None], policy:BatchPolicy) -> t.AsyncIterator[t.List[FrameInfo]]:
+  batch:t.List[FrameInfo] = []
+  batch_bytes = 0
+  deadline = 0.0
+  pending:asyncio.Future|None = None
+  try:
+    while True:
+      if pending is None: pending = asyncio.ensure_future(anext(frames))
+      # NOTE: wait without cancelling, a frame that misses the deadline goes into the next batch
+      timeout = max(deadline-time.perf_counter(), 0) if batch else None
+      done, _ = await asyncio.wait({pending}, timeout=timeout)
+      if not done:
+        yield batch
+        batch, batch_bytes = [], 0
+        continue
+
+      future, pending = pending, None
+      try:
+        frame = future.result()
+      except StopAsyncIteration:
+        if batch: yield batch
+        return
+      if batch and batch_bytes+len(frame.poly_data) > policy.max_bytes:
+        yield batch
+        batch, batch_bytes = [], 0
+      if not batch: deadline = time.perf_counter()+policy.max_delay_sec
+      batch.append(frame)
+      batch_bytes += len(frame.poly_data)
+      if batch_bytes >= policy.max_bytes or policy.max_delay_sec <= 0:
+        yield batch
+        batch, batch_bytes = [], 0
+  finally:
+    # NOTE: the consumer stopped early or failed, frames is closed here and not whenever it gets collected,
+    #       its finally shuts the pools down and flushes the cache, a running anext has to finish before aclose
+    if pending is not None:
+      pending.cancel()
+      await asyncio.wait({pending})
+    await frames.aclose()
+
+async def mock_ws(mesh_id:int, msg_id:int, cache:FrameCache|None = None, delta:bool = False, batching:BatchPolicy = BatchPolicy(), transport:WsOptions = WsOptions(), codecs:Codecs|None = None,
+                  quantizations:Quantizations|None = None, workers:WorkerPolicy = WorkerPolicy()):
+  r = FluentCFFReader(share_topology=True)
+  r.read_project("./data/Fluent-result", lazy=True, fields=FIELDS)
+  # r.read_project("./data/3D-Pipe", lazy=True, fields=FIELDS)
 
   # mesh = mesh_cylinder()
   # if mesh_id == 0: mesh = mesh_from_vtk_legacy("./data/pressure_field_mesh.vtk")
@@ -198,48 +567,27 @@ async def mock_ws(mesh_id:int, msg_id:int):
   #   tail.SetInputConnection(mesh.GetOutputPort())
   #   # tail.ReverseNormalsOn()
 
-  transform = vtk.vtkTransform()
-  transform_filter = vtk.vtkTransformPolyDataFilter()
-  transform_filter.SetTransform(transform)
-  # transform_filter.SetInputConnection(tail.GetOutputPort())
-  # sink = transform_filter
-
-  lut = lut_from_name("jet")
-  lut.SetValueRange((0,1))
-
   writer = None
   uri = f"ws://{HOST}:{PORT}"
-  async with websockets.connect(uri, max_size=None) as ws:
+  pool = BuilderPool()
+  # NOTE: websockets negotiates permessage-deflate unless compression is None
+  compression = "deflate" if transport.deflate else None
+  async with websockets.connect(uri, max_size=None, compression=compression) as ws, \
+             aclosing(batch_frames(frame_payloads(r, cache, delta, codecs, quantizations, workers), batching)) as batches:
     total_frame_count = len(r)
-    async for frame in r:
-      begin_sec = time.perf_counter()
-      geom = vtk.vtkGeometryFilter()
-      geom.SetInputData(frame.dataset)
-      geom.Update()
-      polydata = geom.GetOutput(0)
-
-      transform.RotateX(0.15)
-      transform_filter.SetInputData(polydata)
-      transform_filter.Update()
-      polydata = transform_filter.GetOutput(0)
-
-      cell_to_point = vtk.vtkCellDataToPointData()
-      cell_to_point.SetInputData(polydata)
-      cell_to_point.Update()
-      polydata = cell_to_point.GetOutput()
-      apply_lut(polydata, lut, "VelocityMag")
-
-      xml = xml_from_vtk_mesh(polydata)
-
+    async for batch in batches:
       # cook message
-      recipe = MessageRecipe(total_frame_count, [FrameInfo(frame.frame_index, frame.frame_time, xml)])
-      bs = cooke_message(msg_id, recipe)
-      print(f"processed {(time.perf_counter()-begin_sec)*1000:.4}ms")
-
-      begin_sec = time.perf_counter()
-      await ws.send(bs, text=True)
-      now = time.perf_counter()
-      print(f"sending took {(now-begin_sec)*1000:.4}ms, {len(bs)/(1024*1024):.2}mb, {len(bs)}bytes")
+      recipe = MessageRecipe(total_frame_count, batch)
+      with cooke_pooled_message(pool, msg_id, recipe, external=transport.fragment_size > 0) as msg:
+        begin_sec = time.perf_counter()
+        # NOTE: websockets copies every fragment into its frame before send returns
+        #       binary frames, typed-array payloads are not valid utf-8
+        if transport.fragment_size > 0:
+          await ws.send(message_fragments(msg.chunks, transport.fragment_size), text=False)
+        else:
+          await ws.send(msg.chunks[0], text=False)
+        now = time.perf_counter()
+        print(f"sending {len(batch)} frames took {(now-begin_sec)*1000:.4}ms, {msg.nbytes/(1024*1024):.2}mb, {msg.nbytes}bytes")
       await asyncio.sleep(0.0)
 
       # update mesh
@@ -255,10 +603,11 @@ async def mock_ws(mesh_id:int, msg_id:int):
       # await ws.send("123")
       # print(f"{frame_begin_ms}, {msg.key} {mesh_id}")
   
-async def mock_tcp(mesh_id:int, msg_id:int):
-  r = FluentCFFReader()
-  # r.read_project("./data/Fluent-result")
-  r.read_project("./data/3D-Pipe")
+async def mock_tcp(mesh_id:int, msg_id:int, cache:FrameCache|None = None, delta:bool = False, batching:BatchPolicy = BatchPolicy(), codecs:Codecs|None = None,
+                   quantizations:Quantizations|None = None, workers:WorkerPolicy = WorkerPolicy()):
+  r = FluentCFFReader(share_topology=True)
+  # r.read_project("./data/Fluent-result", lazy=True, fields=FIELDS)
+  r.read_project("./data/3D-Pipe", lazy=True, fields=FIELDS)
 
   # mesh = mesh_cylinder()
   # if mesh_id == 0: mesh = mesh_from_vtk_legacy("./data/pressure_field_mesh.vtk")
@@ -272,70 +621,41 @@ async def mock_tcp(mesh_id:int, msg_id:int):
   #   tail.SetInputConnection(mesh.GetOutputPort())
   #   # tail.ReverseNormalsOn()
 
-  transform = vtk.vtkTransform()
-  transform_filter = vtk.vtkTransformPolyDataFilter()
-  transform_filter.SetTransform(transform)
-  # transform_filter.SetInputConnection(tail.GetOutputPort())
-  # sink = transform_filter
-
-  # "viridis", "plasma", "inferno", "magma", "coolwarm"…
-  # high contrast: turbo, jet, Accent
-  lut = lut_from_name("jet")
-  lut.SetValueRange((0,1))
-  # lut = default_lut(rng, 256*4)
-
   writer = None
   try:
     reader, writer = await asyncio.open_connection(HOST, PORT)
+    # NOTE: the transport keeps views of unsent chunks, drain has to wait until everything is out
+    #       before the builder goes back to the pool
+    writer.transport.set_write_buffer_limits(0)
+    pool = BuilderPool()
     total_frame_count = len(r)
-    async for frame in r:
-      begin_sec = time.perf_counter()
-      geom = vtk.vtkGeometryFilter()
-      geom.SetInputData(frame.dataset)
-      geom.Update()
-      polydata = geom.GetOutput(0)
-
-      transform.RotateX(0.15)
-      transform_filter.SetInputData(polydata)
-      transform_filter.Update()
-      polydata = transform_filter.GetOutput(0)
-
-      cell_to_point = vtk.vtkCellDataToPointData()
-      cell_to_point.SetInputData(polydata)
-      cell_to_point.Update()
-      cell_to_point.SetPassCellData(True) # disable interpolation
-      polydata = cell_to_point.GetOutput()
-      apply_lut(polydata, lut, "VelocityMag")
-
-      xml = xml_from_vtk_mesh(polydata)
-
-      # cook message
-      recipe = MessageRecipe(total_frame_count, [FrameInfo(frame.frame_index, frame.frame_time, xml)])
-      bs = cooke_message(msg_id, recipe)
-      print(f"processed {(time.perf_counter()-begin_sec)*1000:.4}ms")
-
-      begin_sec = time.perf_counter()
-      header = len(bs)
-      header_bytes = struct.pack("=Q", header)
-      writer.write(header_bytes+bs)
-      await writer.drain()
-      now = time.perf_counter()
-      print(f"sending took {(now-begin_sec)*1000:.4}ms, {len(bs)/(1024*1024):.2}mb, {len(bs)}bytes")
-      await asyncio.sleep(0.0)
-      # print(f"sent: {i}")
-
-      # update mesh
-      # transform.RotateX(4.5)
-      # sink.Update()
-      # polydata = transform_filter.GetOutput()
-      # lut_applied = apply_lut(polydata, lut, "p")
-      # xml = xml_from_vtk_mesh(polydata)
-      # bs = stub_message(xml, msg_id)
-
-      # await ws.send(bs)
-      # await ws.send(bs, text=True)
-      # await ws.send("123")
-      # print(f"{frame_begin_ms}, {msg.key} {mesh_id}")
+    async with aclosing(batch_frames(frame_payloads(r, cache, delta, codecs, quantizations, workers), batching)) as batches:
+      async for batch in batches:
+        # cook message
+        recipe = MessageRecipe(total_frame_count, batch)
+        with cooke_pooled_message(pool, msg_id, recipe, external=True) as msg:
+          begin_sec = time.perf_counter()
+          size = msg.nbytes
+          header_bytes = struct.pack("=Q", size)
+          writer.writelines([header_bytes, *msg.chunks])
+          await writer.drain()
+          now = time.perf_counter()
+          print(f"sending {len(batch)} frames took {(now-begin_sec)*1000:.4}ms, {size/(1024*1024):.2}mb, {size}bytes")
+        await asyncio.sleep(0.0)
+        # print(f"sent: {i}")
+
+        # update mesh
+        # transform.RotateX(4.5)
+        # sink.Update()
+        # polydata = transform_filter.GetOutput()
+        # lut_applied = apply_lut(polydata, lut, "p")
+        # xml = xml_from_vtk_mesh(polydata)
+        # bs = stub_message(xml, msg_id)
+
+        # await ws.send(bs)
+        # await ws.send(bs, text=True)
+        # await ws.send("123")
+        # print(f"{frame_begin_ms}, {msg.key} {mesh_id}")
   finally:
     if writer:
       writer.close()
@@ -345,13 +665,36 @@ async def main():
   parser = argparse.ArgumentParser()
   parser.add_argument("--msg_id", type=int, default=0, help="msg_id")
   parser.add_argument("--mesh_id", type=int, default=0, help="mesh_id")
+  parser.add_argument("--cache_dir", type=str, default="./.cache/frames", help="on-disk frame cache, empty to disable")
+  parser.add_argument("--stream_mode", type=str, default="full", choices=["full", "delta"], help="delta: geometry once, then per-frame arrays, the receiver has to understand keyframes and topology ids")
+  parser.add_argument("--batch_bytes", type=int, default=1<<20, help="payload bytes per message before it's sent")
+  parser.add_argument("--batch_delay_ms", type=float, default=20.0, help="max time a frame waits for others to share its message, 0 to disable batching")
+  parser.add_argument("--ws_fragment_bytes", type=int, default=1<<18, help="bytes per websocket frame, 0 to send every message as one frame")
+  parser.add_argument("--ws_deflate", action="store_true", help="offer permessage-deflate")
+  parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="frames processed in parallel")
+  parser.add_argument("--worker_kind", type=str, default="thread", choices=["thread", "process"], help="process: for long offline replays, every worker reads the case once")
+  parser.add_argument("--window", type=int, default=0, help="frames in flight ahead of the sender, 0 for twice the workers")
+  parser.add_argument("--quantize", type=str, default="", help="arrays to send as integers, name=[oct]8|16,... e.g. points=16,VelocityMag=8,Normals=oct16")
+  parser.add_argument("--codecs", type=str, default="", help="array compression, [name=]raw|zlib|lz4|zstd[:level][+shuffle],... e.g. *=zstd:1+shuffle,Colors=lz4")
   args = parser.parse_args()
   print(args.mesh_id, args.msg_id)
+  cache = FrameCache(args.cache_dir) if args.cache_dir else None
+  batching = BatchPolicy(args.batch_bytes, args.batch_delay_ms/1000.0)
+  transport = WsOptions(args.ws_fragment_bytes, args.ws_deflate)
+  try:
+    codecs = parse_codecs(args.codecs)
+  except ValueError as e:
+    parser.error(str(e))
+  try:
+    quantizations = parse_quantizations(args.quantize)
+  except ValueError as e:
+    parser.error(str(e))
+  workers = WorkerPolicy(args.workers, args.worker_kind, args.window or 2*args.workers)
 
   while 1:
     try:
-      await mock_ws(args.mesh_id, args.msg_id)
-      # await mock_tcp(args.mesh_id, args.msg_id)
+      await mock_ws(args.mesh_id, args.msg_id, cache, args.stream_mode == "delta", batching, transport, codecs, quantizations, workers)
+      # await mock_tcp(args.mesh_id, args.msg_id, cache, args.stream_mode == "delta", batching, codecs, quantizations, workers)
       print("OK")
       break
     except Exception as e:
@@ -0,0 +1,211 @@
+import vtk
+import numpy as np
+import flatbuffers
+import typing as t
+from vtk.util import numpy_support
+from Envelope import PolyData, CellArray, DataArray
+from Envelope.PolyData import PolyData as PolyDataTable
+from Envelope.CellArray import CellArray as CellArrayTable
+from Envelope.DataArray import DataArray as DataArrayTable
+from Envelope.DataType import DataType
+from Envelope.Association import Association
+from Envelope.Codec import Codec
+from Envelope.Quantization import Quantization
+from codec import Codecs, CodecSpec, RAW, codec_for, encode, decode
+from quantize import Quantizations, QuantizeSpec, POINTS, quantize, dequantize, max_error
+
+# typed-array encoding of vtkPolyData, see PolyData in ForwardMessage.fbs
+# writers copy every array once into the buffer, receivers wrap the vectors without copying
+
+DTYPES = {
+  DataType.Int8: np.int8, DataType.UInt8: np.uint8, DataType.Int16: np.int16, DataType.UInt16: np.uint16,
+  DataType.Int32: np.int32, DataType.UInt32: np.uint32, DataType.Int64: np.int64, DataType.UInt64: np.uint64,
+  DataType.Float32: np.float32, DataType.Float64: np.float64,
+}
+DATA_TYPES = {np.dtype(v): k for k,v in DTYPES.items()}
+# NOTE: every array vector starts 8 byte aligned so receivers can view it as any type
+ALIGNMENT = 8
+
+def create_aligned_vector(builder:flatbuffers.Builder, values:np.ndarray) -> int:
+  values = np.ascontiguousarray(values).reshape(-1)
+  builder.Prep(ALIGNMENT, values.nbytes)
+  return builder.CreateNumpyVector(values)
+
+# values: (n,) or (n, components) array
+# quantization: float arrays are stored as integers, errors gets the largest absolute error under name,
+#               arrays with NaN/inf values are stored exactly
+def create_data_array_from_numpy(builder:flatbuffers.Builder, name:str, values:np.ndarray, association:int, codec:CodecSpec = RAW,
+                                 quantization:QuantizeSpec|None = None, errors:t.Dict[str,float]|None = None) -> int:
+  n_components = values.shape[1] if values.ndim > 1 else 1
+  value_type = DATA_TYPES[np.dtype(values.dtype.name)]
+  minimum = maximum = None
+  # NOTE: integer arrays, octahedral on anything but 3 components and arrays with NaN/inf values are sent exactly
+  if quantization is not None and (values.dtype.kind != "f" or (quantization.kind == Quantization.Octahedral and n_components != 3)
+                                   or not np.isfinite(values).all()):
+    quantization = None
+  if quantization is not None:
+    q, minimum, maximum = quantize(values, quantization)
+    if errors is not None: errors[name] = max_error(values, dequantize(q, quantization.kind, minimum, maximum, values.dtype))
+    values, n_components = q, q.shape[1]
+  data_type = DATA_TYPES[np.dtype(values.dtype.name)]
+
+  name_str = builder.CreateString(name)
+  data = create_aligned_vector(builder, encode(values, codec))
+  if quantization is not None and quantization.kind == Quantization.Linear:
+    minimum = builder.CreateNumpyVector(minimum)
+    maximum = builder.CreateNumpyVector(maximum)
+  DataArray.Start(builder)
+  DataArray.AddName(builder, name_str)
+  DataArray.AddAssociation(builder, association)
+  DataArray.AddType(builder, data_type)
+  DataArray.AddComponents(builder, n_components)
+  DataArray.AddData(builder, data)
+  if codec.codec != Codec.Raw:
+    DataArray.AddCodec(builder, codec.codec)
+    DataArray.AddShuffle(builder, codec.shuffle)
+    DataArray.AddSize(builder, values.nbytes)
+  if quantization is not None:
+    DataArray.AddQuantization(builder, quantization.kind)
+    DataArray.AddValueType(builder, value_type)
+    if quantization.kind == Quantization.Linear:
+      DataArray.AddMinimum(builder, minimum)
+      DataArray.AddMaximum(builder, maximum)
+  return DataArray.End(builder)
+
+def create_data_array(builder:flatbuffers.Builder, array:vtk.vtkDataArray, association:int, codec:CodecSpec = RAW,
+                      quantization:QuantizeSpec|None = None, errors:t.Dict[str,float]|None = None) -> int:
+  values = numpy_support.vtk_to_numpy(array)
+  return create_data_array_from_numpy(builder, array.GetName() or "", values, association, codec, quantization, errors)
+
+def create_cell_array(builder:flatbuffers.Builder, cells:vtk.vtkCellArray) -> int|None:
+  if cells is None or cells.GetNumberOfCells() == 0: return None
+  offsets = numpy_support.vtk_to_numpy(cells.GetOffsetsArray())
+  connectivity = numpy_support.vtk_to_numpy(cells.GetConnectivityArray())
+  # NOTE: 32 bit whenever the ids fit, half of the bytes of vtk's default 64 bit storage
+  wide = len(connectivity) > np.iinfo(np.int32).max or (len(connectivity) and connectivity.max() > np.iinfo(np.int32).max)
+  dtype = np.int64 if wide else np.int32
+  offsets = create_aligned_vector(builder, offsets.astype(dtype, copy=False))
+  connectivity = create_aligned_vector(builder, connectivity.astype(dtype, copy=False))
+  CellArray.Start(builder)
+  if wide:
+    CellArray.AddOffsets64(builder, offsets)
+    CellArray.AddConnectivity64(builder, connectivity)
+  else:
+    CellArray.AddOffsets(builder, offsets)
+    CellArray.AddConnectivity(builder, connectivity)
+  return CellArray.End(builder)
+
+# upper bound of the size of the PolyData buffer of a mesh, to size the builder once
+# NOTE: counts arrays uncompressed and unquantized, and cells with 64 bit ids
+def poly_data_size_hint(mesh:vtk.vtkPolyData, names:t.Collection[str]|None = None, geometry:bool = True) -> int:
+  ret = 1024
+  for attributes in (mesh.GetPointData(), mesh.GetCellData()):
+    for i in range(attributes.GetNumberOfArrays()):
+      array = attributes.GetArray(i)
+      if not array or (names is not None and array.GetName() not in names): continue
+      ret += array.GetNumberOfValues()*array.GetDataTypeSize() + 256
+  if geometry:
+    ret += mesh.GetNumberOfPoints()*3*4 + 256
+    for cells in (mesh.GetVerts(), mesh.GetLines(), mesh.GetPolys(), mesh.GetStrips()):
+      if cells is not None: ret += (cells.GetNumberOfConnectivityIds()+cells.GetNumberOfCells()+1)*8 + 256
+  return ret
+
+# serialize a polydata to a finished PolyData buffer
+# names: point/cell arrays to keep, None for all
+# geometry: False leaves out points and cells, for delta frames on a known topology
+# codecs: compression of the point/cell arrays by name, everything is raw by default
+# quantizations: float arrays by name and POINTS to send as integers, everything is exact by default
+# errors: filled with the largest absolute error of every quantized array
+# builder: a cleared builder to reuse, e.g. from BuilderPool in main.py, a new one by default
+# NOTE: the payload is copied out of the builder once, the builder can be reused right away
+def poly_data_from_vtk_mesh(mesh:vtk.vtkPolyData, names:t.Collection[str]|None = None, geometry:bool = True, codecs:Codecs|None = None,
+                            quantizations:Quantizations|None = None, errors:t.Dict[str,float]|None = None,
+                            builder:flatbuffers.Builder|None = None) -> bytes:
+  quantizations = quantizations or {}
+  # NOTE: sized once, growing by doubling from a small buffer copies multi-MB arrays over and over
+  size_hint = poly_data_size_hint(mesh, names, geometry)
+  if builder is None: builder = flatbuffers.Builder(size_hint)
+  else: builder.Reserve(size_hint)
+  arrays = []
+  for association, attributes in ((Association.Point, mesh.GetPointData()), (Association.Cell, mesh.GetCellData())):
+    for i in range(attributes.GetNumberOfArrays()):
+      array = attributes.GetArray(i)
+      if not array: continue # NOTE: skips string and other non-numeric arrays
+      if names is not None and array.GetName() not in names: continue
+      arrays.append(create_data_array(builder, array, association, codec_for(codecs, array.GetName()), quantizations.get(array.GetName()), errors))
+  PolyData.StartArraysVector(builder, len(arrays))
+  for array in reversed(arrays):
+    builder.PrependUOffsetTRelative(array)
+  arrays_vector = builder.EndVector()
+
+  points = quantized_points = None
+  cells = [None]*4
+  if geometry:
+    if mesh.GetPoints() is not None:
+      values = numpy_support.vtk_to_numpy(mesh.GetPoints().GetData()).astype(np.float32, copy=False)
+      if POINTS in quantizations:
+        spec = QuantizeSpec(Quantization.Linear, quantizations[POINTS].bits)
+        quantized_points = create_data_array_from_numpy(builder, POINTS, values, Association.Point, RAW, spec, errors)
+      else:
+        points = create_aligned_vector(builder, values)
+    cells = [create_cell_array(builder, c) for c in (mesh.GetVerts(), mesh.GetLines(), mesh.GetPolys(), mesh.GetStrips())]
+
+  PolyData.Start(builder)
+  if points is not None: PolyData.AddPoints(builder, points)
+  if quantized_points is not None: PolyData.AddQuantizedPoints(builder, quantized_points)
+  for add, cell_array in zip((PolyData.AddVerts, PolyData.AddLines, PolyData.AddPolys, PolyData.AddStrips), cells):
+    if cell_array is not None: add(builder, cell_array)
+  PolyData.AddArrays(builder, arrays_vector)
+  builder.Finish(PolyData.End(builder))
+  # NOTE: one copy out of the builder, Output() would slice a copy first
+  return bytes(memoryview(builder.Bytes)[builder.Head():])
+
+def vtk_cell_array(cells:CellArrayTable) -> vtk.vtkCellArray:
+  if cells.OffsetsIsNone():
+    offsets, connectivity = cells.Offsets64AsNumpy(), cells.Connectivity64AsNumpy()
+  else:
+    offsets, connectivity = cells.OffsetsAsNumpy(), cells.ConnectivityAsNumpy()
+  ret = vtk.vtkCellArray()
+  ret.SetData(numpy_support.numpy_to_vtk(offsets, deep=False), numpy_support.numpy_to_vtk(connectivity, deep=False))
+  return ret
+
+# values of a DataArray table as (n,) or (n, components) array
+# NOTE: exact uncompressed arrays are views into the message buffer, the others are decoded into arrays of their own
+def data_array_values(array:DataArrayTable) -> np.ndarray:
+  dtype = DTYPES[array.Type()]
+  values = array.DataAsNumpy()
+  if isinstance(values, int): values = np.empty(0, dtype=np.uint8)
+  values = decode(values, array.Codec(), array.Shuffle(), np.dtype(dtype).itemsize, array.Size()).view(dtype)
+  n_components = array.Components()
+  if array.Quantization() != Quantization.Exact:
+    values = dequantize(values, array.Quantization(), array.MinimumAsNumpy(), array.MaximumAsNumpy(), DTYPES[array.ValueType()])
+    n_components = values.shape[1]
+  return values.reshape(-1, n_components) if n_components > 1 else values.reshape(-1)
+
+# wrap a PolyData table as vtkPolyData, arrays are views into the message buffer
+# NOTE: compressed and quantized arrays are decoded into arrays of their own
+# topology: geometry of the keyframe for delta frames, shared with the result
+# NOTE: the message buffer must stay alive as long as the result is used
+def vtk_mesh_from_poly_data(poly_data:PolyDataTable, topology:vtk.vtkPolyData|None = None) -> vtk.vtkPolyData:
+  ret = vtk.vtkPolyData()
+  if topology is not None: ret.CopyStructure(topology)
+
+  quantized_points = poly_data.QuantizedPoints()
+  if not poly_data.PointsIsNone() or quantized_points is not None:
+    values = poly_data.PointsAsNumpy().reshape(-1, 3) if quantized_points is None else data_array_values(quantized_points)
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(values, deep=False))
+    ret.SetPoints(points)
+  for get_cells, set_cells in ((poly_data.Verts, ret.SetVerts), (poly_data.Lines, ret.SetLines), (poly_data.Polys, ret.SetPolys), (poly_data.Strips, ret.SetStrips)):
+    cells = get_cells()
+    if cells is not None: set_cells(vtk_cell_array(cells))
+
+  for i in range(poly_data.ArraysLength()):
+    array = poly_data.Arrays(i)
+    vtk_array = numpy_support.numpy_to_vtk(data_array_values(array), deep=False)
+    vtk_array.SetName(array.Name().decode("utf-8"))
+    association = array.Association()
+    if association == Association.Point: ret.GetPointData().AddArray(vtk_array)
+    elif association == Association.Cell: ret.GetCellData().AddArray(vtk_array)
+    else: ret.GetFieldData().AddArray(vtk_array)
+  return ret
@@ -0,0 +1,165 @@
+import time
+import numpy as np
+import typing as t
+from dataclasses import dataclass
+from Envelope.Quantization import Quantization
+
+# lossy integer encodings of float arrays for bandwidth-bound links, see DataArray in ForwardMessage.fbs
+# Linear: per component min/max range split into 2^bits-1 steps, the error is at most half a step
+# Octahedral: unit vectors projected on the octahedron and folded into the [-1,1] square, 2 integers per vector
+
+@dataclass(frozen=True)
+class QuantizeSpec:
+  kind:int = Quantization.Linear
+  bits:int = 16
+
+# array name -> quantization, POINTS for the point coordinates, arrays not listed are sent exactly
+Quantizations = t.Mapping[str,QuantizeSpec]
+POINTS = "points"
+
+# "name=[oct]bits,...", e.g. "points=16,VelocityMag=8,Normals=oct16"
+def parse_quantizations(text:str) -> t.Dict[str,QuantizeSpec]:
+  ret = {}
+  for item in filter(None, (s.strip() for s in text.split(","))):
+    name, _, spec = item.partition("=")
+    kind = Quantization.Octahedral if spec.startswith("oct") else Quantization.Linear
+    bits = spec.removeprefix("oct")
+    if not name or bits not in ("8", "16"): raise ValueError(f"invalid quantization {item!r}, expected name=[oct]8|16")
+    ret[name] = QuantizeSpec(kind, int(bits))
+  return ret
+
+def format_quantization(spec:QuantizeSpec) -> str:
+  return f"{'oct' if spec.kind == Quantization.Octahedral else ''}{spec.bits}"
+
+# NaN and inf have no integer code, the range and the float to integer cast would turn them into garbage
+def check_finite(values:np.ndarray):
+  if not np.isfinite(values).all(): raise ValueError("can't quantize non-finite values")
+
+# (n,) or (n, components) values -> integers, per component minimum and maximum
+# NOTE: ValueError for NaN/inf values, see check_finite
+def quantize_linear(values:np.ndarray, bits:int) -> t.Tuple[np.ndarray,np.ndarray,np.ndarray]:
+  values = values.reshape(len(values), -1)
+  check_finite(values)
+  levels = (1 << bits)-1
+  minimum = values.min(axis=0).astype(np.float64) if len(values) else np.zeros(values.shape[1])
+  maximum = values.max(axis=0).astype(np.float64) if len(values) else np.zeros(values.shape[1])
+  extent = maximum-minimum
+  scale = np.divide(levels, extent, out=np.zeros_like(extent), where=extent > 0)
+  q = (values-minimum)*scale
+  np.rint(q, out=q)
+  return q.astype(np.uint8 if bits == 8 else np.uint16), minimum, maximum
+
+def dequantize_linear(q:np.ndarray, minimum:np.ndarray, maximum:np.ndarray, dtype:np.dtype) -> np.ndarray:
+  levels = np.iinfo(q.dtype).max
+  q = q.reshape(-1, len(minimum))
+  step = ((maximum-minimum)/levels).astype(dtype)
+  ret = q.astype(dtype)
+  ret *= step
+  ret += minimum.astype(dtype)
+  return ret
+
+# (n, 3) unit vectors -> (n, 2) signed integers
+def quantize_octahedral(values:np.ndarray, bits:int) -> np.ndarray:
+  values = values.reshape(-1, 3).astype(np.float64)
+  check_finite(values)
+  norm = np.abs(values).sum(axis=1, keepdims=True)
+  norm[norm == 0] = 1
+  p = values[:,:2]/norm
+  z = values[:,2]/norm[:,0]
+  # the lower half folds over the diagonals
+  sign = np.where(p >= 0, 1.0, -1.0)
+  folded = (1-np.abs(p[:,::-1]))*sign
+  p = np.where((z < 0)[:,None], folded, p)
+  levels = (1 << (bits-1))-1
+  q = p*levels
+  np.rint(q, out=q)
+  return q.astype(np.int8 if bits == 8 else np.int16)
+
+def dequantize_octahedral(q:np.ndarray, dtype:np.dtype) -> np.ndarray:
+  levels = np.iinfo(q.dtype).max
+  q = q.reshape(-1, 2)
+  ret = np.empty((len(q), 3), dtype=dtype)
+  np.multiply(q, dtype.type(1.0/levels), out=ret[:,:2], casting="unsafe")
+  x, y, z = ret[:,0], ret[:,1], ret[:,2]
+  np.subtract(1, np.abs(x), out=z)
+  z -= np.abs(y)
+  fold = np.maximum(-z, 0)
+  x -= np.copysign(fold, x)
+  y -= np.copysign(fold, y)
+  ret /= np.linalg.norm(ret, axis=1, keepdims=True)
+  return ret
+
+# stored integers, minimum and maximum (empty for Octahedral)
+def quantize(values:np.ndarray, spec:QuantizeSpec) -> t.Tuple[np.ndarray,np.ndarray,np.ndarray]:
+  if spec.kind == Quantization.Octahedral:
+    return quantize_octahedral(values, spec.bits), np.empty(0), np.empty(0)
+  return quantize_linear(values, spec.bits)
+
+# (n, components) values of dtype
+def dequantize(q:np.ndarray, kind:int, minimum:np.ndarray, maximum:np.ndarray, dtype:np.dtype) -> np.ndarray:
+  if kind == Quantization.Octahedral: return dequantize_octahedral(q, np.dtype(dtype))
+  return dequantize_linear(q, minimum, maximum, np.dtype(dtype))
+
+# largest absolute difference of any component
+def max_error(values:np.ndarray, restored:np.ndarray) -> float:
+  if values.size == 0: return 0.0
+  return float(np.max(np.abs(values.reshape(restored.shape).astype(np.float64)-restored)))
+
+# frame size and error of every quantization against exact frames, with and without compression
+def benchmark(project_dir:str, fields:t.List[str], n_frames:int = 10):
+  import vtk
+  from vtk.util import numpy_support
+  from reader.fluent_cff import FluentCFFReader
+  from surface import SurfaceExtractor, CellToPoint
+  from lut import lut_from_name, apply_lut, ColorMap
+  from poly_data import poly_data_from_vtk_mesh
+  from codec import parse_codecs
+  r = FluentCFFReader(share_topology=True)
+  r.read_project(project_dir, lazy=True, fields=fields)
+  surface = SurfaceExtractor()
+  cell_to_point = CellToPoint()
+  lut = lut_from_name("jet")
+  lut.SetValueRange((0,1))
+  color_map = ColorMap(lut)
+  normals = vtk.vtkPolyDataNormals()
+  normals.SplittingOff()
+
+  settings = [
+    ("exact", {}),
+    ("points=16", parse_quantizations("points=16")),
+    ("scalars=16", parse_quantizations(",".join(f"{f}=16" for f in fields))),
+    ("scalars=8", parse_quantizations(",".join(f"{f}=8" for f in fields))),
+    ("normals=oct16", parse_quantizations("Normals=oct16")),
+    ("all 16", parse_quantizations(",".join([f"{f}=16" for f in fields]+["points=16", "Normals=oct16"]))),
+    ("all 8", parse_quantizations(",".join([f"{f}=8" for f in fields]+["points=16", "Normals=oct8"]))),
+  ]
+  n_frames = min(n_frames, len(r))
+  sizes = {name: [0, 0] for name, _ in settings}
+  errors:t.Dict[str,t.Dict[str,float]] = {name: {} for name, _ in settings}
+  encode_sec = {name: 0.0 for name, _ in settings}
+  for index in range(n_frames):
+    polydata = cell_to_point(surface(r[index].dataset))
+    apply_lut(polydata, color_map, "VelocityMag")
+    normals.SetInputData(polydata)
+    normals.Update()
+    polydata = normals.GetOutput()
+    for name, quantizations in settings:
+      frame_errors:t.Dict[str,float] = {}
+      begin_sec = time.perf_counter()
+      payload = poly_data_from_vtk_mesh(polydata, quantizations=quantizations, errors=frame_errors)
+      encode_sec[name] += time.perf_counter()-begin_sec
+      sizes[name][0] += len(payload)
+      sizes[name][1] += len(poly_data_from_vtk_mesh(polydata, codecs=parse_codecs("*=zstd:1+shuffle"), quantizations=quantizations))
+      for array, error in frame_errors.items(): errors[name][array] = max(errors[name].get(array, 0.0), error)
+
+  print(f"{project_dir}: {n_frames} frames, {polydata.GetNumberOfPoints()} points")
+  for name, _ in settings:
+    exact = sizes["exact"]
+    print(f"  {name:>14}: {sizes[name][0]/n_frames/1024:7.1f}kb/frame ({exact[0]/sizes[name][0]:.2f}x), "
+          f"zstd:1+shuffle {sizes[name][1]/n_frames/1024:7.1f}kb/frame ({exact[0]/sizes[name][1]:.2f}x), encode {encode_sec[name]*1000/n_frames:.3f}ms")
+    for array, error in errors[name].items():
+      print(f"    {array:>14} max error {error:.3g}")
+
+if __name__ == "__main__":
+  benchmark("./data/Fluent-result", ["SV_U", "SV_V", "VelocityMag"])
+  benchmark("./data/3D-Pipe", ["SV_U", "SV_V", "VelocityMag"])
@@ -18,12 +18,18 @@ from vtkmodules.vtkRenderingCore import (
 from vtkmodules.vtkInteractionStyle import vtkInteractorStyleTrackballCamera
 import h5py
 # import sexpdata
-import time
+import os
+import mmap
+import multiprocessing
 import glob
+import tempfile
 import typing as t
+from concurrent.futures import ProcessPoolExecutor, wait
+from collections import OrderedDict
+from threading import Lock
 from lut import lut_from_name
 from dataclasses import dataclass, field
-from core import Reader, Frame, PipelineInformation
+from core import Reader, Frame, PipelineInformation, FramePrefetcher
 
 @dataclass
 class NamedArray:
@@ -36,6 +42,9 @@ class FluentData:
   phase_count:int
   cell_data:t.Dict[str,NamedArray]
 
+  def nbytes(self) -> int:
+    return sum(arr.array.nbytes for arr in self.cell_data.values())
+
 # FIXME: name conflic
 @dataclass
 class TimeStep:
@@ -44,7 +53,7 @@ class TimeStep:
   cas_file:str
   dat_file:str
   cas:vtk.vtkUnstructuredGrid
-  dat:FluentData
+  dat:FluentData|None # NOTE: None if the project was indexed lazily, see FluentDataCache
 
 @dataclass
 class CFF:
@@ -71,149 +80,322 @@ def print_group(name, obj):
 #       if(isinstance(i, list) and i[0] == sexpdata.Symbol("autosave/solution-points")):
 #         print(i)
 
+# cell arrays computed by FluentCFFReader from other dat sections
+DERIVED_FIELDS:t.Dict[str,t.Tuple[str,...]] = {
+  "VelocityMag": ("SV_U", "SV_V"),
+}
+
+# expand a field selection with the dat sections its derived fields are computed from
+def dat_fields_for(fields:t.Iterable[str]|None) -> t.Set[str]|None:
+  if fields is None: return None
+  ret: t.Set[str] = set()
+  for name in fields:
+    ret.update(DERIVED_FIELDS.get(name, (name,)))
+  return ret
+
+# collect the cell sections of an opened CFD Fluent .dat.h5 file
+# returns the phase count and the hdf5 dataset of every array name, in file order
+# NOTE: fields selects the sections by their array name (phase prefix included), None selects all of them
+def dat_sections(f:h5py.File, fields:t.Collection[str]|None = None) -> t.Tuple[int, t.Dict[str,h5py.Dataset]]:
+  phase_count: int = 0
+  ret: t.Dict[str,h5py.Dataset] = {}
+  # f.visititems(print_group)
+  # import sys
+  # sys.exit(0)
+
+  obj_info = f["/results/1"]
+  settings = f["/settings"]
+  # datvars = f["/settings/Data Variables"][0].decode("ascii")
+  if obj_info:
+    iphase: int = 1
+    phase = f.get(f"/results/1/phase-{iphase}", None)
+    while phase:
+      phase_count += 1
+      group_cell = phase.get("cells", None)
+      assert group_cell
+      dset = group_cell.get("fields", None)
+      assert dset
+      fields_raw = dset[()][0].decode()
+      v_str = fields_raw.split(";")
+
+      for section_name in v_str:
+        if section_name in group_cell:
+          groupdata_name = section_name
+          if iphase > 1: section_name = f"phase_{iphase-1}-{section_name}"
+          if fields is not None and section_name not in fields: continue
+          groupdata = group_cell[groupdata_name]
+          n_sections = int(groupdata.attrs["nSections"][0])
+          # FIXME: every section covers the whole cell range in our data, the last one wins
+          dset = groupdata[str(n_sections)]
+          # min_id = int(dset.attrs["minId"][0])
+          # max_id = int(dset.attrs["maxId"][0])
+
+          # # scalar values
+          # if ndims == 1:
+          #   values.n_component = 1
+          #   values.array = data[(min_id-1):max_id]
+          # # vector values
+          # elif ndims <= 3:
+          #   vector_data = []
+          #   for k in range(ndims):
+          #     for j in range(min_id-1, max_id):
+          #       vector_data.append(float(data[j][k]))
+          #   values.n_component = ndims
+          #   values.array = vector_data
+
+          ret[section_name] = dset
+
+      # advance
+      phase = f.get(f"/results/1/phase-{iphase}", None)
+      iphase += 1
+  return phase_count, ret
+
+def named_array(name:str, data:np.ndarray) -> NamedArray:
+  n_components = 1 if data.ndim == 1 else data.shape[-1]
+  return NamedArray(name, n_components, data)
+
 # load CFD Fluent .dat.h5 file
-def load_dat_file(dat_filename:str) -> FluentData:
+# NOTE: sections are read straight into buffers of the on-disk dtype, pass dtype to have hdf5 convert while reading
+def load_dat_file(dat_filename:str, dtype:np.dtype|None = None, fields:t.Collection[str]|None = None) -> FluentData:
   ret: FluentData = FluentData(phase_count=0, cell_data={})
   # FIXME: mtime should be stored on some directory inside h5
 
   with h5py.File(dat_filename, "r") as f:
-    # f.visititems(print_group)
-    # import sys
-    # sys.exit(0)
-
-    obj_info = f["/results/1"]
-    settings = f["/settings"]
-    # datvars = f["/settings/Data Variables"][0].decode("ascii")
-    if obj_info:
-      iphase: int = 1
-      phase = f.get(f"/results/1/phase-{iphase}", None)
-      while phase:
-        ret.phase_count += 1
-        group_cell = phase.get("cells", None)
-        assert group_cell
-        dset = group_cell.get("fields", None)
-        assert dset
-        fields_raw = dset[()][0].decode()
-        v_str = fields_raw.split(";")
-
-        for section_name in v_str:
-          if section_name in group_cell:
-            groupdata = group_cell[section_name]
-            if iphase > 1: section_name = f"phase_{iphase-1}-{section_name}"
-            n_sections = int(groupdata.attrs["nSections"][0])
-            for i_section in range(1, n_sections+1):
-              dset = groupdata[str(i_section)]
-              min_id = int(dset.attrs["minId"][0])
-              max_id = int(dset.attrs["maxId"][0])
-              data = dset[()]
-              data = data.astype(np.float64)
-              ndims = data.ndim
-              dims = data.shape
-              n_components = 1 if ndims == 1 else dims[-1]
-              values: NamedArray = NamedArray(section_name, n_components, data)
-
-              # # scalar values
-              # if ndims == 1:
-              #   values.n_component = 1
-              #   values.array = data[(min_id-1):max_id]
-              # # vector values
-              # elif ndims <= 3:
-              #   vector_data = []
-              #   for k in range(ndims):
-              #     for j in range(min_id-1, max_id):
-              #       vector_data.append(float(data[j][k]))
-              #   values.n_component = ndims
-              #   values.array = vector_data
-
-              # insert into cell_data
-              ret.cell_data[section_name] = values
-
-        # advance
-        phase = f.get(f"/results/1/phase-{iphase}", None)
-        iphase += 1
+    ret.phase_count, sections = dat_sections(f, fields)
+    for name, dset in sections.items():
+      data = np.empty(dset.shape, dtype=dtype or dset.dtype)
+      if data.size: dset.read_direct(data)
+      ret.cell_data[name] = named_array(name, data)
+  return ret
+
+################################
+## Parallel loading
+
+# directory the worker processes hand decoded dat files back through, tmpfs on linux
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+SHM_ALIGNMENT = 64
+
+# layout of a dat file decoded by a worker process into a shared memory file
+@dataclass
+class SharedFluentData:
+  path:str
+  phase_count:int
+  arrays:t.List[t.Tuple[str,t.Tuple[int,...],str,int]] # name, shape, dtype, offset
+
+# runs in a worker process, sections are read straight into the shared memory file
+def load_dat_file_shared(dat_filename:str, dtype:np.dtype|None = None, fields:t.Collection[str]|None = None) -> SharedFluentData:
+  with h5py.File(dat_filename, "r") as f:
+    phase_count, sections = dat_sections(f, fields)
+    arrays = []
+    size = 0
+    for name, dset in sections.items():
+      dt = np.dtype(dtype or dset.dtype)
+      size = -(-size//SHM_ALIGNMENT)*SHM_ALIGNMENT
+      arrays.append((name, tuple(dset.shape), dt.str, size))
+      size += int(np.prod(dset.shape, dtype=np.int64))*dt.itemsize
+
+    fd, path = tempfile.mkstemp(prefix="fluent-", suffix=".dat", dir=SHM_DIR)
+    try:
+      os.ftruncate(fd, max(size, 1))
+      with mmap.mmap(fd, max(size, 1)) as mm:
+        for (name, shape, dt, offset), dset in zip(arrays, sections.values()):
+          data = np.ndarray(shape, dtype=dt, buffer=mm, offset=offset)
+          if data.size: dset.read_direct(data)
+          del data
+    except BaseException:
+      os.unlink(path)
+      raise
+    finally:
+      os.close(fd)
+  return SharedFluentData(path, phase_count, arrays)
+
+# map a worker's shared memory file into this process, the file is unlinked once mapped
+# NOTE: copy-on-write mapping, arrays are writable without touching the shared pages
+def attach_shared(shared:SharedFluentData) -> FluentData:
+  try:
+    mm = np.memmap(shared.path, dtype=np.uint8, mode="c")
+  finally:
+    os.unlink(shared.path)
+  ret = FluentData(phase_count=shared.phase_count, cell_data={})
+  for name, shape, dt, offset in shared.arrays:
+    data = np.ndarray(shape, dtype=dt, buffer=mm, offset=offset)
+    ret.cell_data[name] = named_array(name, data)
   return ret
 
+# bounded LRU of decoded dat files, evicts the least recently used entries once max_bytes is exceeded
+class FluentDataCache:
+  def __init__(self, max_bytes:int):
+    self.max_bytes:int = max_bytes
+    self.nbytes:int = 0
+    self.entries:OrderedDict[str,FluentData] = OrderedDict()
+    self.lck = Lock()
+
+  def get(self, dat_file:str) -> FluentData|None:
+    with self.lck:
+      dat = self.entries.get(dat_file, None)
+      if dat is not None: self.entries.move_to_end(dat_file)
+      return dat
+
+  def put(self, dat_file:str, dat:FluentData):
+    with self.lck:
+      old = self.entries.pop(dat_file, None)
+      if old is not None: self.nbytes -= old.nbytes()
+      self.entries[dat_file] = dat
+      self.nbytes += dat.nbytes()
+      # NOTE: always keep the most recent entry, even if it alone exceeds the budget
+      while self.nbytes > self.max_bytes and len(self.entries) > 1:
+        _, evicted = self.entries.popitem(last=False)
+        self.nbytes -= evicted.nbytes()
+
+  def clear(self):
+    with self.lck:
+      self.entries.clear()
+      self.nbytes = 0
+
+  def __len__(self) -> int:
+    return len(self.entries)
+
+DEFAULT_CACHE_BYTES = 512*1024*1024
+
 class FluentCFFReader(Reader):
-  def __init__(self):
+  # prefetch: number of frames decoded ahead on worker threads during async iteration (async for frame in reader),
+  #           0 decodes on the event loop
+  # NOTE: the streaming pipeline doesn't iterate the reader, it indexes frames on its own pool, see FrameScheduler in main.py
+  # share_topology: frames share points and cells of the case grid instead of deep copying it
+  # dtype: convert cell arrays while reading, None keeps the on-disk dtype
+  def __init__(self, cache_bytes:int = DEFAULT_CACHE_BYTES, prefetch:int = 0, share_topology:bool = False, dtype:np.dtype|None = None):
     self.frame_index:int = 0
     self.reader = vtkFLUENTCFFReader()
     self.is_dirty = False
     self.steps:t.List[TimeStep] = []
+    self.cache = FluentDataCache(cache_bytes)
+    self.prefetch:int = prefetch
+    self.prefetcher:FramePrefetcher|None = None
+    self.share_topology:bool = share_topology
+    self.dtype:np.dtype|None = dtype
+    self.fields:t.Set[str]|None = None
+    self.dat_fields:t.Set[str]|None = None
+    self.project_dir:str|None = None
 
   def __aiter__(self):
     self.frame_index = 0
+    if self.prefetcher: self.prefetcher.close()
+    self.prefetcher = None
+    if self.prefetch > 0:
+      self.prefetcher = FramePrefetcher(self.__getitem__, range(len(self.steps)), self.prefetch)
     return self
 
   async def __anext__(self) -> Frame:
+    if self.prefetcher:
+      ret = await anext(self.prefetcher)
+      self.frame_index = ret.frame_index+1
+      return ret
     if self.frame_index >= (len(self.steps)):
       raise StopAsyncIteration
     ret = self[self.frame_index]
     self.frame_index += 1
     return ret
 
+  def load_step(self, index:int) -> FluentData:
+    step = self.steps[index]
+    if step.dat is not None: return step.dat
+    dat = self.cache.get(step.dat_file)
+    if dat is None:
+      dat = load_dat_file(step.dat_file, self.dtype, self.dat_fields)
+      self.cache.put(step.dat_file, dat)
+    return dat
+
   # @lru_cache(None)
   def __getitem__(self, index:int) -> Frame:
-    step = self.steps[index]
     # FIXME: we don't have duration
     info = PipelineInformation(len(self.steps), 1000)
     step = self.steps[index]
+    dat = self.load_step(index)
     # FIXME: we can create a grid with empty geometry and updated cell data to save some bandwitdh
-    # FIXME: should we clone this cas? just use the same ref for now
     dataset = vtk.vtkUnstructuredGrid()
-    dataset.DeepCopy(step.cas) # NOTE: we need to deep copy to make cache work
+    if self.share_topology:
+      # NOTE: points and cells are reference counted from the case grid, only the cell data is per frame
+      #       the case grid is treated as immutable, consumers must not modify a frame's geometry in place
+      dataset.CopyStructure(step.cas)
+      cas_cell_data = step.cas.GetCellData()
+      for i in range(cas_cell_data.GetNumberOfArrays()):
+        cas_array = cas_cell_data.GetAbstractArray(i)
+        name = cas_array.GetName()
+        if name not in dat.cell_data and self.is_selected(name):
+          dataset.GetCellData().AddArray(cas_array)
+    else:
+      dataset.DeepCopy(step.cas) # NOTE: we need to deep copy to make cache work
+      if self.fields is not None:
+        cell_data = dataset.GetCellData()
+        for name in [cell_data.GetArrayName(i) for i in range(cell_data.GetNumberOfArrays())]:
+          if not self.is_selected(name): cell_data.RemoveArray(name)
 
     # fill dataset with step dat
-    for k,arr in step.dat.cell_data.items():
-      array_name = k
-      vtk_array = dataset.GetCellData().GetArray(array_name)
-      if not vtk_array:
-        vtk_array = vtk.vtkFloatArray()
-        vtk_array.SetName(k)
-        vtk_array.SetNumberOfComponents(arr.n_component)
-        vtk_array.SetNumberOfTuples(dataset.GetNumberOfCells())
-        dataset.GetCellData().AddArray(vtk_array)
-      np_array: np.ndarray = numpy_support.vtk_to_numpy(vtk_array)
-      assert isinstance(np_array, np.ndarray)
-      # FIXME: different number of component for the same named array, what fuck?
-      try:
-        np_array[:] = arr.array
-      except: pass
-
-    sv_u = numpy_support.vtk_to_numpy(dataset.cell_data["SV_U"])
-    sv_v = numpy_support.vtk_to_numpy(dataset.cell_data["SV_V"])
-    # z = dataset.points[0][2]
-    z = 0
-    sv_w = np.full_like(sv_u, z)
-    vel = np.stack((sv_u, sv_v, sv_w), axis=-1)
-    vel_mag = np.linalg.norm(vel, axis=-1)
-    # vel /= np.expand_dims(vel_mag, axis=-1)
-    # vel_inverted = -1 * vel.copy()
-
-    vtk_array = dataset.GetCellData().GetArray("VelocityMag")
-    if not vtk_array:
-      vtk_array = vtk.vtkFloatArray()
+    # NOTE: vtk arrays wrap the decoded buffers without copying, they alias the cached dat so treat them as read-only
+    n_cells = dataset.GetNumberOfCells()
+    for k,arr in dat.cell_data.items():
+      # NOTE: sections only decoded as inputs of a derived field are not attached
+      if not self.is_selected(k): continue
+      # FIXME: sections that only cover part of the cells are skipped for now
+      if arr.array.shape[0] != n_cells: continue
+      vtk_array = numpy_support.numpy_to_vtk(arr.array, deep=False)
+      vtk_array.SetName(k)
+      # NOTE: replaces any array of the same name coming from the case grid
+      dataset.GetCellData().AddArray(vtk_array)
+
+    if self.is_selected("VelocityMag") and "SV_U" in dat.cell_data and "SV_V" in dat.cell_data:
+      sv_u = dat.cell_data["SV_U"].array
+      sv_v = dat.cell_data["SV_V"].array
+      # z = dataset.points[0][2]
+      # NOTE: w is 0, so |(u,v,w)| is just hypot(u,v)
+      vel_mag = np.hypot(sv_u, sv_v, dtype=np.float32)
+      # vel /= np.expand_dims(vel_mag, axis=-1)
+      # vel_inverted = -1 * vel.copy()
+
+      vtk_array = numpy_support.numpy_to_vtk(vel_mag, deep=False)
       vtk_array.SetName("VelocityMag")
-      vtk_array.SetNumberOfComponents(1)
-      vtk_array.SetNumberOfValues(dataset.GetNumberOfCells())
       dataset.GetCellData().SetScalars(vtk_array)
-    np_wrapper = numpy_support.vtk_to_numpy(vtk_array)
-    np_wrapper[:] = vel_mag
 
-    ret = Frame(info, index, index*0.02, dataset)
+    ret = Frame(info, index, self.frame_time(index), dataset)
     return ret
 
+  # FIXME: flow time is not read from the dat file yet
+  def frame_time(self, index:int) -> float:
+    return index*0.02
+
+  # cas and dat file a frame is built from
+  def frame_files(self, index:int) -> t.List[str]:
+    step = self.steps[index]
+    return [step.cas_file, step.dat_file]
+
   def __len__(self) -> int:
     return len(self.steps)
 
+  def is_selected(self, name:str) -> bool:
+    return self.fields is None or name in self.fields
+
   def reset(self):
     self.frame_index = 0
+    if self.prefetcher: self.prefetcher.close()
+    self.prefetcher = None
     self.reader = vtkFLUENTCFFReader()
     self.is_dirty = False
     self.steps = []
+    self.cache.clear()
+    self.fields = None
+    self.dat_fields = None
     # self.__getitem__.cache_clear()
 
-  def read_project(self, project_dir:str):
+  # NOTE: with lazy=True only file names and step numbers are indexed here,
+  #       each dat file is decoded the first time its frame is requested
+  # NOTE: fields selects the cell arrays attached to frames (derived ones like VelocityMag included),
+  #       dat sections that are neither selected nor needed by a selected derived field are never read
+  # NOTE: workers > 1 decodes the dat files of an eager read on a process pool
+  def read_project(self, project_dir:str, lazy:bool = False, fields:t.Iterable[str]|None = None, workers:int = 0):
     if self.is_dirty: self.reset()
+    self.project_dir = project_dir
+    self.fields = None if fields is None else set(fields)
+    self.dat_fields = dat_fields_for(self.fields)
     # read case file, optionaly with a data file if there is a *.dat.h5
     cas_file = glob.glob(f"{project_dir}/*.cas.h5")[0]
     self.reader.SetFileName(cas_file)
@@ -226,19 +408,47 @@ class FluentCFFReader(Reader):
     cas: vtk.vtkUnstructuredGrid = blocks.GetBlock(0)
     assert(isinstance(cas, vtk.vtkUnstructuredGrid))
 
+    dat_files = sorted(glob.glob(f"{project_dir}/*.dat.h5"))
+    dats: t.List[FluentData|None] = [None]*len(dat_files)
+    if not lazy and workers > 1:
+      dats = self.load_parallel(dat_files, workers)
+    elif not lazy:
+      dats = [load_dat_file(dat_file, self.dtype, self.dat_fields) for dat_file in dat_files]
+
     steps: t.List[TimeStep]  = []
-    for dat_file in sorted(glob.glob(f"{project_dir}/*.dat.h5")):
+    for dat_file, dat in zip(dat_files, dats):
       step_idx = int(dat_file.split("-")[-1].split(".")[0])
-      dat: FluentData = load_dat_file(dat_file)
       step = TimeStep(step_idx, cas_file, dat_file, cas, dat)
       steps.append(step)
     self.steps = steps
     self.is_dirty = True
 
+  # decode dat files on a process pool, results come back in the order of dat_files
+  def load_parallel(self, dat_files:t.List[str], workers:int) -> t.List[FluentData]:
+    ret: t.List[FluentData] = []
+    # NOTE: spawn like FrameScheduler, a forked worker inherits the locks of VTK's and h5py's threads in whatever state
+    #       they were and can hang on its first read, a spawned one pays for importing this module (~1s) once instead
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+      futures = [executor.submit(load_dat_file_shared, dat_file, self.dtype, self.dat_fields) for dat_file in dat_files]
+      try:
+        for future in futures:
+          ret.append(attach_shared(future.result()))
+      except BaseException:
+        # NOTE: files of workers that were not attached yet would leak in SHM_DIR, including the ones of workers
+        #       still running, so queued loads are cancelled and running ones waited for before cleaning up
+        for future in futures: future.cancel()
+        wait(futures)
+        for future in futures[len(ret):]:
+          if future.cancelled() or future.exception(): continue
+          shared = future.result()
+          if os.path.exists(shared.path): os.unlink(shared.path)
+        raise
+    return ret
+
 def main():
   project_dir = "./data/Fluent-result"
-  reader = FluentCFFReader()
-  reader.read_project(project_dir)
+  reader = FluentCFFReader(share_topology=True)
+  reader.read_project(project_dir, lazy=True)
 
   assert len(reader) > 0
   frame_0 = reader[0]
@@ -0,0 +1,215 @@
+import vtk
+import time
+import numpy as np
+import typing as t
+from vtk.util import numpy_support
+
+# extracts the boundary surface of a volumetric dataset once per topology,
+# every later frame only gathers its attribute arrays through the recorded id maps
+# NOTE: the topology is recognized by its vtkPoints/vtkCellArray objects, use FluentCFFReader(share_topology=True)
+#       so all frames of a run hand over the same ones, otherwise the surface is rebuilt every frame
+class SurfaceExtractor:
+  def __init__(self):
+    self.points:vtk.vtkPoints|None = None
+    self.cells:vtk.vtkCellArray|None = None
+    self.surface:vtk.vtkPolyData|None = None
+    self.cell_ids:np.ndarray|None = None  # surface cell -> volume cell
+    self.point_ids:np.ndarray|None = None # surface point -> volume point
+
+  def is_built_for(self, dataset:vtk.vtkUnstructuredGrid) -> bool:
+    return self.surface is not None and dataset.GetPoints() is self.points and dataset.GetCells() is self.cells
+
+  def build(self, dataset:vtk.vtkUnstructuredGrid):
+    # run the filter on the bare structure, attributes are gathered per frame anyway
+    structure = vtk.vtkUnstructuredGrid()
+    structure.CopyStructure(dataset)
+    geom = vtk.vtkGeometryFilter()
+    geom.SetInputData(structure)
+    geom.PassThroughCellIdsOn()
+    geom.PassThroughPointIdsOn()
+    geom.Update()
+    surface:vtk.vtkPolyData = geom.GetOutput(0)
+
+    cell_ids_name = geom.GetOriginalCellIdsName()
+    point_ids_name = geom.GetOriginalPointIdsName()
+    self.cell_ids = numpy_support.vtk_to_numpy(surface.GetCellData().GetArray(cell_ids_name)).astype(np.int64)
+    self.point_ids = numpy_support.vtk_to_numpy(surface.GetPointData().GetArray(point_ids_name)).astype(np.int64)
+    surface.GetCellData().RemoveArray(cell_ids_name)
+    surface.GetPointData().RemoveArray(point_ids_name)
+
+    self.surface = surface
+    self.points = dataset.GetPoints()
+    self.cells = dataset.GetCells()
+
+  def __call__(self, dataset:vtk.vtkUnstructuredGrid) -> vtk.vtkPolyData:
+    if not self.is_built_for(dataset): self.build(dataset)
+    assert self.surface is not None
+    ret = vtk.vtkPolyData()
+    # NOTE: shares points and polys with the cached surface, consumers must not modify them in place
+    ret.CopyStructure(self.surface)
+    gather_attributes(dataset.GetCellData(), ret.GetCellData(), self.cell_ids)
+    gather_attributes(dataset.GetPointData(), ret.GetPointData(), self.point_ids)
+    ret.GetFieldData().ShallowCopy(dataset.GetFieldData())
+    return ret
+
+# copy every numeric array of src into dst, keeping only the tuples at ids
+def gather_attributes(src:vtk.vtkDataSetAttributes, dst:vtk.vtkDataSetAttributes, ids:np.ndarray):
+  for i in range(src.GetNumberOfArrays()):
+    array = src.GetArray(i)
+    if not array: continue # NOTE: skips string and other non-numeric arrays
+    values = np.take(numpy_support.vtk_to_numpy(array), ids, axis=0)
+    gathered = numpy_support.numpy_to_vtk(values, deep=False, array_type=array.GetDataType())
+    gathered.SetName(array.GetName())
+    dst.AddArray(gathered)
+    attribute = src.IsArrayAnAttribute(i)
+    if attribute >= 0: dst.SetActiveAttribute(array.GetName(), attribute)
+
+# cell ids of every point of a polydata as (point id, cell id) pairs, cell ids numbered verts, lines, polys, strips
+def point_cell_pairs(polydata:vtk.vtkPolyData) -> t.Tuple[np.ndarray,np.ndarray]:
+  points = []
+  cells = []
+  first_cell = 0
+  for cell_array in (polydata.GetVerts(), polydata.GetLines(), polydata.GetPolys(), polydata.GetStrips()):
+    if cell_array is None or cell_array.GetNumberOfCells() == 0: continue
+    conn = numpy_support.vtk_to_numpy(cell_array.GetConnectivityArray()).astype(np.int64)
+    offsets = numpy_support.vtk_to_numpy(cell_array.GetOffsetsArray()).astype(np.int64)
+    n_cells = len(offsets)-1
+    points.append(conn)
+    cells.append(np.repeat(np.arange(first_cell, first_cell+n_cells, dtype=np.int64), np.diff(offsets)))
+    first_cell += n_cells
+  if not points: return np.empty(0, np.int64), np.empty(0, np.int64)
+  return np.concatenate(points), np.concatenate(cells)
+
+# replacement of vtkCellDataToPointData for polydata whose topology does not change between frames
+# the point-from-cell averaging operator is built once in a padded (ELL) layout with implicit 1/n weights:
+# slot j holds the j-th cell of every point, every frame then interpolates all of its cell arrays together
+# with one gather and add per slot, i.e. a loop over the largest cell count of a point (6 on a triangle surface)
+# NOTE: every point sums its cells in ascending cell order in double precision and divides by the count,
+#       which reproduces vtkCellDataToPointData bit for bit
+# NOTE: a CSR product with np.add.reduceat is slower here and rounds differently, it doesn't add in order
+class CellToPoint:
+  def __init__(self, pass_cell_data:bool = False):
+    self.pass_cell_data:bool = pass_cell_data
+    self.cell_arrays:t.Tuple|None = None
+    self.n_points:int = 0
+    self.n_cells:int = 0
+    self.slots:np.ndarray|None = None  # (max cells per point, n_points), padded with n_cells
+    self.count:np.ndarray|None = None  # (n_points, 1) cells per point, 1 for unused points
+
+  def is_built_for(self, polydata:vtk.vtkPolyData) -> bool:
+    cell_arrays = (polydata.GetVerts(), polydata.GetLines(), polydata.GetPolys(), polydata.GetStrips())
+    return (self.cell_arrays is not None and self.n_points == polydata.GetNumberOfPoints()
+      and all(a is b for a,b in zip(self.cell_arrays, cell_arrays)))
+
+  def build(self, polydata:vtk.vtkPolyData):
+    self.cell_arrays = (polydata.GetVerts(), polydata.GetLines(), polydata.GetPolys(), polydata.GetStrips())
+    self.n_points = polydata.GetNumberOfPoints()
+    self.n_cells = polydata.GetNumberOfCells()
+    points, cells = point_cell_pairs(polydata)
+
+    # (point, cell) pairs sorted by point, then cell, the position of a pair within its point is its slot
+    order = np.lexsort((cells, points))
+    counts = np.bincount(points, minlength=self.n_points)
+    first = np.zeros(self.n_points, dtype=np.int64)
+    np.cumsum(counts[:-1], out=first[1:])
+    rows = points[order]
+    slot = np.arange(len(rows), dtype=np.int64) - first[rows]
+    max_count = int(counts.max()) if len(counts) else 0
+    self.slots = np.full((max_count, self.n_points), self.n_cells, dtype=np.int64)
+    self.slots[slot, rows] = cells[order]
+    self.count = np.maximum(counts, 1).astype(np.float64)[:,None]
+
+  # interpolate (n_cells+1, n_components) double values to (n_points, n_components)
+  # NOTE: the last row is the padding cell and has to be zero
+  def apply(self, values:np.ndarray) -> np.ndarray:
+    assert self.slots is not None and self.count is not None
+    acc = np.zeros((self.n_points, values.shape[1]), dtype=np.float64)
+    gathered = np.empty_like(acc)
+    for slot in self.slots:
+      np.take(values, slot, axis=0, out=gathered)
+      acc += gathered
+    acc /= self.count
+    return acc
+
+  def __call__(self, polydata:vtk.vtkPolyData) -> vtk.vtkPolyData:
+    if not self.is_built_for(polydata): self.build(polydata)
+    ret = vtk.vtkPolyData()
+    ret.CopyStructure(polydata)
+    ret.GetPointData().PassData(polydata.GetPointData())
+    if self.pass_cell_data: ret.GetCellData().PassData(polydata.GetCellData())
+    ret.GetFieldData().PassData(polydata.GetFieldData())
+
+    cell_data = polydata.GetCellData()
+    arrays = [(i, cell_data.GetArray(i)) for i in range(cell_data.GetNumberOfArrays()) if cell_data.GetArray(i)]
+    if not arrays: return ret
+
+    # batch every cell array into one (n_cells, total components) matrix
+    n_components = [array.GetNumberOfComponents() for _, array in arrays]
+    values = np.empty((self.n_cells+1, sum(n_components)), dtype=np.float64)
+    values[self.n_cells] = 0
+    column = 0
+    for (_, array), n in zip(arrays, n_components):
+      values[:self.n_cells, column:column+n] = numpy_support.vtk_to_numpy(array).reshape(self.n_cells, n)
+      column += n
+    interpolated = self.apply(values)
+
+    column = 0
+    point_data = ret.GetPointData()
+    for (i, array), n in zip(arrays, n_components):
+      dtype = numpy_support.get_numpy_array_type(array.GetDataType())
+      out = interpolated[:, column] if n == 1 else interpolated[:, column:column+n]
+      out = np.ascontiguousarray(out, dtype=dtype)
+      column += n
+      vtk_array = numpy_support.numpy_to_vtk(out, deep=False, array_type=array.GetDataType())
+      vtk_array.SetName(array.GetName())
+      point_data.AddArray(vtk_array)
+      attribute = cell_data.IsArrayAnAttribute(i)
+      if attribute >= 0: point_data.SetActiveAttribute(array.GetName(), attribute)
+    return ret
+
+# compare the cached surface and cell-to-point operators against the per-frame vtk filters
+def benchmark(project_dir:str, fields:t.List[str], n_frames:int = 20):
+  from reader.fluent_cff import FluentCFFReader
+  r = FluentCFFReader(share_topology=True)
+  r.read_project(project_dir, lazy=True, fields=fields)
+  surface = SurfaceExtractor()
+  cell_to_point = CellToPoint()
+  begin_sec = time.perf_counter()
+  cell_to_point.build(surface(r[0].dataset))
+  print(f"{project_dir}: built surface and operator in {(time.perf_counter()-begin_sec)*1000:.4}ms")
+  filter_sec = [0.0, 0.0]
+  cached_sec = [0.0, 0.0]
+  n_frames = min(n_frames, len(r))
+  for index in range(n_frames):
+    dataset = r[index].dataset
+
+    begin_sec = time.perf_counter()
+    geom = vtk.vtkGeometryFilter()
+    geom.SetInputData(dataset)
+    geom.Update()
+    filter_sec[0] += time.perf_counter()-begin_sec
+    begin_sec = time.perf_counter()
+    c2p = vtk.vtkCellDataToPointData()
+    c2p.SetInputData(geom.GetOutput(0))
+    c2p.Update()
+    expected = c2p.GetOutput().GetPointData()
+    filter_sec[1] += time.perf_counter()-begin_sec
+
+    begin_sec = time.perf_counter()
+    polydata = surface(dataset)
+    cached_sec[0] += time.perf_counter()-begin_sec
+    begin_sec = time.perf_counter()
+    got = cell_to_point(polydata).GetPointData()
+    cached_sec[1] += time.perf_counter()-begin_sec
+
+    for i in range(expected.GetNumberOfArrays()):
+      name = expected.GetArrayName(i)
+      assert np.array_equal(numpy_support.vtk_to_numpy(expected.GetArray(i)), numpy_support.vtk_to_numpy(got.GetArray(name))), name
+
+  print(f"  {n_frames} frames, {polydata.GetNumberOfCells()} surface cells, {polydata.GetNumberOfPoints()} points")
+  print(f"  geometry      filter {filter_sec[0]*1000/n_frames:.4}ms/frame, cached {cached_sec[0]*1000/n_frames:.4}ms/frame")
+  print(f"  cell to point filter {filter_sec[1]*1000/n_frames:.4}ms/frame, cached {cached_sec[1]*1000/n_frames:.4}ms/frame")
+
+if __name__ == "__main__":
+  benchmark("./data/Fluent-result", ["SV_U", "SV_V", "VelocityMag"])
+  benchmark("./data/3D-Pipe", ["SV_U", "SV_V", "VelocityMag"])
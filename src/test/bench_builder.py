@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import time
+import flatbuffers
+from main import FrameInfo, MessageRecipe, build_message, BuilderPool
+
+# microbenchmark of the flatbuffers write path: a ForwardMessage with n Information entries,
+# each with a small payload and a transform, so it's dominated by per-field work, not by copies
+def bench(n_frames:int, repeat:int, pool:BuilderPool|None):
+  payload = bytes(64)
+  transform = [float(i) for i in range(16)]
+  recipe = MessageRecipe(n_frames, [FrameInfo(i, i*0.02, payload, 1, i == 0, transform) for i in range(n_frames)])
+  best = float("inf")
+  size = 0
+  for _ in range(repeat):
+    begin_sec = time.perf_counter()
+    builder = pool.acquire() if pool else flatbuffers.Builder(1024)
+    build_message(builder, 0, recipe)
+    size = builder.Offset()
+    if pool: pool.release(builder)
+    best = min(best, time.perf_counter()-begin_sec)
+  print(f"{n_frames:>5} informations {'pooled' if pool else 'fresh '}: {best*1000:8.3f}ms, {best*1e6/n_frames:6.2f}us/information, {size} bytes")
+
+if __name__ == "__main__":
+  for pool in (None, BuilderPool()):
+    for n_frames in (1, 10, 100, 1000):
+      bench(n_frames, max(5, 2000//n_frames), pool)
@@ -5,40 +5,334 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 import asyncio
 import vtk
 import time
+import numpy as np
 from websockets.asyncio.server import serve, ServerConnection 
 from websockets.asyncio.connection import ConnectionClosedOK
 from Envelope.ForwardMessage import ForwardMessage
 from Envelope.DataObject import DataObject
 from Envelope.Information import Information
 from Envelope.PipelineInformation import PipelineInformation
-from threading import Thread, Event, Lock
+from Envelope.PolyData import PolyData
+from poly_data import vtk_mesh_from_poly_data
+from vtk.util import numpy_support
+from threading import Thread, Event, local
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from collections import OrderedDict
 import typing as t
 
 @dataclass
 class Frame:
   index:int
   timestep:float
-  xml:str
+  xml:str|None # NOTE: legacy, frames of older writers
+  poly_data:PolyData|None
+  topology_id:int = 0
+  keyframe:bool = False
+  transform:t.List[float]|None = None
 
-frames:t.List[Frame] = []
+# frames sorted by timestep, the timesteps are kept in a contiguous float64 array to bisect
+# NOTE: find remembers where the last lookup ended, playback moving forward only checks the next frame
+#       and bisects when the clock jumps, e.g. when it loops
+class Timeline:
+  def __init__(self, capacity:int = 256):
+    self.times:np.ndarray = np.empty(capacity, dtype=np.float64)
+    self.frames:t.List[Frame] = []
+    self.cursor:int = -1
+
+  def __len__(self) -> int:
+    return len(self.frames)
+
+  def clear(self):
+    self.frames = []
+    self.cursor = -1
+
+  # frames may arrive in any order, a frame with the timestep of another one replaces it
+  def insert(self, frame:Frame):
+    n = len(self.frames)
+    i = int(np.searchsorted(self.times[:n], frame.timestep, "left"))
+    if i < n and self.times[i] == frame.timestep:
+      self.frames[i] = frame
+      return
+    if n == len(self.times):
+      times = np.empty(2*len(self.times), dtype=np.float64)
+      times[:n] = self.times[:n]
+      self.times = times
+    self.times[i+1:n+1] = self.times[i:n]
+    self.times[i] = frame.timestep
+    self.frames.insert(i, frame)
+    if i <= self.cursor: self.cursor += 1
+
+  # position of the last frame at or before timestep, -1 if there's none
+  def find(self, timestep:float) -> int:
+    n = len(self.frames)
+    times = self.times
+    for i in (self.cursor, self.cursor+1):
+      if 0 <= i < n and times[i] <= timestep and (i+1 == n or timestep < times[i+1]):
+        self.cursor = i
+        return i
+    self.cursor = int(np.searchsorted(times[:n], timestep, "right"))-1
+    return self.cursor
+
+  # weight of the frame after i at timestep, for TemporalInterpolator
+  def alpha(self, i:int, timestep:float) -> float:
+    if i < 0 or i+1 >= len(self.frames): return 0.0
+    span = self.times[i+1]-self.times[i]
+    return min(max((timestep-self.times[i])/span, 0.0), 1.0)
+
+# blends the attribute arrays of two neighbouring frames on the same geometry, in numpy
+# NOTE: arrays missing from either frame are taken from the first one as they are,
+#       integer arrays like Colors are rounded back to their type
+class TemporalInterpolator:
+  def __call__(self, a:vtk.vtkPolyData, b:vtk.vtkPolyData, alpha:float) -> vtk.vtkPolyData|None:
+    if a.GetNumberOfPoints() != b.GetNumberOfPoints() or a.GetNumberOfCells() != b.GetNumberOfCells(): return None
+    ret = vtk.vtkPolyData()
+    ret.CopyStructure(a)
+    for src, other, dst in ((a.GetPointData(), b.GetPointData(), ret.GetPointData()), (a.GetCellData(), b.GetCellData(), ret.GetCellData())):
+      for i in range(src.GetNumberOfArrays()):
+        array = src.GetArray(i)
+        if not array: continue
+        values = numpy_support.vtk_to_numpy(array)
+        other_array = other.GetArray(array.GetName())
+        other_values = numpy_support.vtk_to_numpy(other_array) if other_array else None
+        if other_values is None or other_values.shape != values.shape:
+          dst.AddArray(array)
+          continue
+        dst.AddArray(self.blend(array, values, other_values, alpha))
+    return ret
+
+  def blend(self, array:vtk.vtkDataArray, values:np.ndarray, other_values:np.ndarray, alpha:float) -> vtk.vtkDataArray:
+    dtype = values.dtype if values.dtype.kind == "f" else np.float32
+    blended = other_values.astype(dtype)
+    blended -= values
+    blended *= alpha
+    blended += values
+    if values.dtype.kind != "f": np.rint(blended, out=blended)
+    ret = numpy_support.numpy_to_vtk(blended.astype(values.dtype, copy=False), deep=False, array_type=array.GetDataType())
+    ret.SetName(array.GetName())
+    return ret
+
+  # NOTE: blends the matrices elementwise, close enough to rigid for the small steps between frames
+  def transform(self, a:t.List[float]|None, b:t.List[float]|None, alpha:float) -> t.List[float]|None:
+    if a is None or b is None: return a
+    return [x+(y-x)*alpha for x,y in zip(a, b)]
+
+# blend neighbouring frames during playback instead of holding every frame until the next one
+INTERPOLATE = False
+# memory budget of decoded frames, playback loops without decoding as long as the sequence fits
+DECODED_FRAME_BYTES = 512<<20
 
 stop_evt = Event()
-lck = Lock()
-clock_begin = 0
-clock_started = False
 
-def render_worker():
-  global clock_begin
-  global clock_started
+def parse_xml(reader:vtk.vtkXMLPolyDataReader, xml:str) -> vtk.vtkPolyData:
+  reader.SetInputString(xml)
+  reader.Modified()
+  reader.Update()
+  ret = vtk.vtkPolyData()
+  ret.ShallowCopy(reader.GetOutput())
+  return ret
+
+# turns received frames into ready vtkPolyData on a worker pool as they arrive, the render loop only swaps them in
+# NOTE: delta frames get the geometry of their keyframe, which is always submitted before them
+class FrameDecoder:
+  def __init__(self, workers:int = 2):
+    self.workers:int = workers
+    self.executor = ThreadPoolExecutor(workers, thread_name_prefix="decode")
+    self.local = local()
+    self.keyframes:t.Dict[int,Future] = {} # topology id -> decoded keyframe
+
+  def reset(self):
+    self.keyframes.clear()
+
+  # NOTE: resubmitting a frame reuses its keyframe, only the first submission of a keyframe becomes the topology
+  def submit(self, frame:Frame) -> Future:
+    keyframe = None if frame.topology_id == 0 or frame.keyframe else self.keyframes.get(frame.topology_id, None)
+    future = self.executor.submit(self.decode, frame, keyframe)
+    if frame.topology_id != 0 and frame.keyframe: self.keyframes.setdefault(frame.topology_id, future)
+    return future
+
+  def decode(self, frame:Frame, keyframe:Future|None) -> vtk.vtkPolyData|None:
+    if frame.poly_data is None:
+      if not frame.xml: return None
+      reader = getattr(self.local, "reader", None)
+      if reader is None:
+        reader = self.local.reader = vtk.vtkXMLPolyDataReader()
+        reader.ReadFromInputStringOn()
+      return parse_xml(reader, frame.xml)
+    if frame.topology_id == 0 or frame.keyframe: return vtk_mesh_from_poly_data(frame.poly_data)
+    topology = keyframe.result() if keyframe is not None else None
+    return vtk_mesh_from_poly_data(frame.poly_data, topology) if topology is not None else None
+
+# bytes a decoded frame adds, the geometry of delta frames belongs to their keyframe
+def polydata_nbytes(polydata:vtk.vtkPolyData, geometry:bool) -> int:
+  if geometry: return polydata.GetActualMemorySize()*1024
+  ret = 0
+  for attributes in (polydata.GetPointData(), polydata.GetCellData(), polydata.GetFieldData()):
+    for i in range(attributes.GetNumberOfArrays()):
+      array = attributes.GetAbstractArray(i)
+      if array: ret += array.GetActualMemorySize()*1024
+  return ret
+
+# decoded frames by index within a memory budget, the least recently used ones are dropped first
+# dropped frames are decoded again from their message when they are asked for, see request and poll
+# NOTE: owned by the render thread, decodes it requested are polled instead of calling back from the pool
+class DecodedFrameStore:
+  def __init__(self, max_bytes:int):
+    self.max_bytes:int = max_bytes
+    self.nbytes:int = 0
+    self.entries:OrderedDict[int,t.Tuple[vtk.vtkPolyData,int]] = OrderedDict()
+    self.pending:t.Dict[int,t.Tuple[Future,bool]] = {}
+    self.decodes:int = 0 # frames decoded since the last reset
+
+  def get(self, index:int) -> vtk.vtkPolyData|None:
+    entry = self.entries.get(index, None)
+    if entry is None: return None
+    self.entries.move_to_end(index)
+    return entry[0]
+
+  # nbytes: see polydata_nbytes
+  def put(self, index:int, polydata:vtk.vtkPolyData|None, nbytes:int):
+    self.pending.pop(index, None)
+    self.decodes += 1
+    if polydata is None: return
+    old = self.entries.pop(index, None)
+    if old is not None: self.nbytes -= old[1]
+    self.entries[index] = (polydata, nbytes)
+    self.nbytes += nbytes
+    # NOTE: the newest frame stays even if it's over budget on its own
+    while self.nbytes > self.max_bytes and len(self.entries) > 1:
+      _, (_, dropped) = self.entries.popitem(last=False)
+      self.nbytes -= dropped
+
+  # decode a frame that's not in the store, once at a time
+  def request(self, frame:Frame, decoder:"FrameDecoder"):
+    if frame.index in self.entries or frame.index in self.pending: return
+    self.pending[frame.index] = (decoder.submit(frame), frame.topology_id == 0 or frame.keyframe)
+
+  # move finished decodes into the store
+  def poll(self):
+    for index, (future, geometry) in [item for item in self.pending.items() if item[1][0].done()]:
+      polydata = future.result()
+      self.put(index, polydata, polydata_nbytes(polydata, geometry) if polydata is not None else 0)
+
+  def reset(self):
+    self.entries.clear()
+    self.pending.clear()
+    self.nbytes = 0
+    self.decodes = 0
+
+# single-producer single-consumer ring of decoded frames, from the network thread to the render thread
+# NOTE: lock-free, the producer only writes tail and the free slots, the consumer only head and the slots it took,
+#       the GIL makes the slot store visible before the index store that publishes it
+class FrameHandoff:
+  def __init__(self, capacity:int = 4096):
+    self.slots:t.List[t.Any] = [None]*capacity
+    self.head:int = 0 # next slot to read, written by the consumer only
+    self.tail:int = 0 # next slot to write, written by the producer only
 
+  def __len__(self) -> int:
+    return self.tail-self.head
+
+  # False when the ring is full, the producer retries later
+  def push(self, item:t.Any) -> bool:
+    tail = self.tail
+    if tail-self.head == len(self.slots): return False
+    self.slots[tail % len(self.slots)] = item
+    self.tail = tail+1
+    return True
+
+  def pop(self) -> t.Any|None:
+    head = self.head
+    if head == self.tail: return None
+    i = head % len(self.slots)
+    item, self.slots[i] = self.slots[i], None
+    self.head = head+1
+    return item
+
+# handed over to the render thread in place of a frame when a new stream starts
+RESET = (None, None, 0)
+
+# render thread side of the receiver, owns the timeline, the decoded frames and the playback clock
+# NOTE: frames come in through handoff only, nothing here is shared with the network thread
+class Playback:
+  def __init__(self, handoff:FrameHandoff, decoder:"FrameDecoder", interpolate:bool = False, max_bytes:int = DECODED_FRAME_BYTES):
+    self.handoff:FrameHandoff = handoff
+    self.decoder = decoder
+    self.timeline = Timeline()
+    self.store = DecodedFrameStore(max_bytes)
+    self.interpolator = TemporalInterpolator() if interpolate else None
+    self.clock_begin:float = 0.0
+    self.clock_started:bool = False
+    # self.time_scale = 0.10
+    self.time_scale:float = 1.5
+    # self.duration = frames[-1].timestep
+    self.duration:float = 4.0
+
+  def reset(self):
+    self.timeline.clear()
+    self.store.reset()
+    self.clock_started = False
+    self.clock_begin = 0.0
+
+  # take over frames from the network thread, at most max_frames per tick so a burst doesn't stall rendering
+  def receive(self, max_frames:int = 64) -> int:
+    for n in range(max_frames):
+      item = self.handoff.pop()
+      if item is None: return n
+      frame, polydata, nbytes = item
+      if frame is None:
+        self.reset()
+        continue
+      self.store.put(frame.index, polydata, nbytes)
+      self.timeline.insert(frame)
+      if not self.clock_started:
+        self.clock_started = True
+        self.clock_begin = time.perf_counter()
+    return max_frames
+
+  # dataset and transform to show now, None before the first frame and while a frame is still being decoded
+  def tick(self) -> t.Tuple[vtk.vtkPolyData|None,t.List[float]|None]:
+    self.receive()
+    self.store.poll()
+    if not self.clock_started: return None, None
+    elapsed = (time.perf_counter()-self.clock_begin)*self.time_scale
+    if elapsed > self.duration:
+      elapsed %= self.duration
+      self.clock_begin = time.perf_counter()-elapsed/self.time_scale
+      print(f"loop, {self.store.decodes} frames decoded so far, {len(self.store.entries)} frames {self.store.nbytes/(1<<20):.1f}mb decoded")
+    return self.pick_frame(elapsed)
+
+  # NOTE: decoded by FrameDecoder, nothing is parsed here, a dropped frame is requested again
+  #       and the current one stays on screen until it's back
+  def pick_frame(self, timestep:float) -> t.Tuple[vtk.vtkPolyData|None,t.List[float]|None]:
+    timeline, store = self.timeline, self.store
+    i = timeline.find(timestep)
+    if i < 0: return None, None
+    frame = timeline.frames[i]
+    polydata = store.get(frame.index)
+    if polydata is None:
+      store.request(frame, self.decoder)
+      return None, None
+    if self.interpolator is None or i+1 >= len(timeline): return polydata, frame.transform
+
+    following = timeline.frames[i+1]
+    following_polydata = store.get(following.index)
+    if following_polydata is None:
+      store.request(following, self.decoder)
+      return polydata, frame.transform
+    alpha = timeline.alpha(i, timestep)
+    blended = self.interpolator(polydata, following_polydata, alpha)
+    if blended is None: return polydata, frame.transform
+    return blended, self.interpolator.transform(frame.transform, following.transform, alpha)
+
+decoder = FrameDecoder()
+handoff = FrameHandoff()
+
+def render_worker():
   c = vtk.vtkCylinderSource()
   c.SetResolution(8)
   c.Update()
 
-  reader = vtk.vtkXMLPolyDataReader()
-  reader.ReadFromInputStringOn()
-
   # mapper.SetInputConnection(c.GetOutputPort())
   mapper = vtk.vtkPolyDataMapper()
   # mapper.SetArrayName("Colors")
@@ -72,112 +366,97 @@ def render_worker():
   # timer_id = iren.CreateRepeatingTimer(1)
   # iren.Start()
 
+  # NOTE: the render thread owns the mapper, the actor and everything in playback,
+  #       the only thing it shares with the network thread is the handoff ring
+  playback = Playback(handoff, decoder, INTERPOLATE)
+  shown:vtk.vtkPolyData|None = None
   while not stop_evt.is_set():
     try:
-      with lck:
-        # Testing
-        # for idx, f in enumerate(frames):
-        #   prev = None
-        #   if idx > 0: prev = frames[idx-1]
-        #   next = None
-        #   if idx < (len(frames)-1): next = frames[idx+1]
-        #   if prev: assert f.timestep > prev.timestep
-        #   if next: assert f.timestep < next.timestep
-
-        if clock_started:
-          elapsed = time.perf_counter()-clock_begin
-          # time_scale = 0.10
-          time_scale = 1.5
-          elapsed = elapsed*time_scale
-
-          # duration = frames[-1].timestep
-          duration = 4.0
-          if elapsed > duration:
-            while elapsed > duration:
-              elapsed -= duration
-            if elapsed < 0: elapsed = 0
-            clock_begin = time.perf_counter()
-
-          # FIXME: use TemporalInterpolator
-          # find the frame
-          frame = None
-          frame_idx = -1
-          for idx, f in enumerate(frames):
-            if (elapsed) < f.timestep:
-              print(f"{elapsed} => {f.timestep}")
-              # assert False
-              break
-            else:
-              frame = f 
-              frame_idx = idx
-
-          if frame:
-            print(f"Frame {frame_idx} picked")
-            reader.SetInputString(frame.xml)
-            reader.Update()
-            mapper.SetInputData(reader.GetOutput())
-            mapper.Modified()
-            mapper.Update()
-          
-        iren.ProcessEvents()
-        win.Render()
-        # NOTE: do this to release python GIL lock
-        time.sleep(0)
-        # iren.Start()
-        # iren.DestroyTimer(timer_id)
+      polydata, transform = playback.tick()
+      if polydata is not None and polydata is not shown:
+        shown = polydata
+        if transform is not None:
+          matrix = vtk.vtkMatrix4x4()
+          matrix.DeepCopy(transform)
+          actor.SetUserMatrix(matrix)
+        mapper.SetInputData(polydata)
+        mapper.Modified()
+        mapper.Update()
+
+      iren.ProcessEvents()
+      win.Render()
+      # NOTE: do this to release python GIL lock
+      time.sleep(0)
+      # iren.Start()
+      # iren.DestroyTimer(timer_id)
     except Exception as e:
       print(e)
       raise
 
+# NOTE: waits only when the ring is full, reading the socket and decoding go on meanwhile
+async def hand_over(item:t.Tuple):
+  while not handoff.push(item):
+    await asyncio.sleep(0.001)
+
+# hands decoded frames over to the render thread in the order they were received
+async def publish_frames(decoded:asyncio.Queue):
+  while True:
+    item = await decoded.get()
+    if item is None: return
+    frame, future = item
+    # NOTE: a frame that fails to decode (corrupt payload, codec module missing) is dropped, the stream goes on
+    try:
+      polydata = await asyncio.wrap_future(future)
+    except Exception as e:
+      print(f"frame {frame.index} dropped, decoding failed: {e!r}")
+      continue
+    # NOTE: sized here, vtk calls release the GIL and would stall the render thread while other threads run
+    nbytes = polydata_nbytes(polydata, frame.topology_id == 0 or frame.keyframe) if polydata is not None else 0
+    await hand_over((frame, polydata, nbytes))
+
 async def handle_message(websocket: ServerConnection):
-  global clock_begin
-  global clock_started
-  global frames
   print("client connection")
-  with lck:
-    clock_started = False
-    clock_begin = 0
-    frames = []
-  while not stop_evt.is_set():
-    try:
-      raw = await websocket.recv(decode=False)
-    except ConnectionClosedOK:
-      return
+  decoder.reset()
+  await hand_over(RESET)
+  # NOTE: bounded, a sender faster than decoding blocks on put below and stops being read (tcp backpressure)
+  #       instead of piling up decode futures and decoded frames outside the store's budget
+  decoded:asyncio.Queue = asyncio.Queue(maxsize=2*decoder.workers)
+  publisher = asyncio.create_task(publish_frames(decoded))
+  try:
+    while not stop_evt.is_set():
+      try:
+        # NOTE: messages are binary frames, decode=False skips utf-8 decoding and fragments are joined into one bytes
+        raw = await websocket.recv(decode=False)
+      except ConnectionClosedOK:
+        return
 
-    # parse frame
-    message = ForwardMessage.GetRootAs(raw, 0)
-    msg_timestamp = message.Timestamp()
-    pipeline_info = message.PipelineInfo()
-    information_count = message.InformationsLength()
-    fs = []
-    for i in range(information_count):
-      information = message.Informations(0)
-      frame_index = information.FrameIndex()
-      frame_timestep = information.FrameTimestep()
-      data_object = information.DataObject()
-      xml = data_object.Xml()
-      frame = Frame(frame_index, frame_timestep, xml.decode("utf-8"))
-      assert isinstance(xml, bytes)
-      fs.append(frame)
-
-    # NOTE(k): we have to this lock, otherwise vtk could crash
-    # seem like we can't call vtk in another thread
-    with lck:
-      for frame in fs:
-        if frame.index < (len(frames)-1):
-          frames[frame.index] = frame
-        else:
-          frames.append(frame)
-        frames[frame.index] = frame
-      if not clock_started:
-        clock_started=True
-        clock_begin_ms = time.perf_counter()*1000.0
+      # parse frame
+      message = ForwardMessage.GetRootAs(raw, 0)
+      msg_timestamp = message.Timestamp()
+      pipeline_info = message.PipelineInfo()
+      information_count = message.InformationsLength()
+      for i in range(information_count):
+        information = message.Informations(i)
+        frame_index = information.FrameIndex()
+        frame_timestep = information.FrameTimestep()
+        data_object = information.DataObject()
+        xml = data_object.Xml()
+        # NOTE: wraps the message buffer, nothing is copied
+        poly_data = None if data_object.PolyDataIsNone() else data_object.PolyDataNestedRoot()
+        transform = None if data_object.TransformIsNone() else data_object.TransformAsNumpy().tolist()
+        frame = Frame(frame_index, frame_timestep, xml.decode("utf-8") if xml else None, poly_data, data_object.TopologyId(), data_object.Keyframe(), transform)
+        # NOTE: decoded off the render and network threads, see FrameDecoder
+        await decoded.put((frame, decoder.submit(frame)))
+  finally:
+    await decoded.put(None)
+    await publisher
 
 def message_worker():
   host = "localhost"
   port = 8080
 
   async def start():
+    # NOTE: permessage-deflate is only used when the sender offers it, see --ws_deflate in main.py
     async with serve(handle_message, host, port, max_size=None) as server:
       print(f"Listening on {host}:{port}")
       await server.serve_forever()
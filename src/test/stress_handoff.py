@@ -0,0 +1,104 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import time
+import vtk
+import numpy as np
+import typing as t
+from threading import Thread, Event
+from vtk.util import numpy_support
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+from main import FrameInfo, MessageRecipe, cooke_message
+from poly_data import poly_data_from_vtk_mesh
+import server
+
+# stress test of the frame handoff: a client pumps prebuilt messages over loopback as fast as the socket takes them
+# while this thread runs the render loop of server.py with a simulated draw, and reports the jitter of its ticks
+# NOTE: nothing is drawn, render_sec stands in for win.Render so it runs without a display
+
+def mesh(resolution:int) -> vtk.vtkPolyData:
+  sphere = vtk.vtkSphereSource()
+  sphere.SetThetaResolution(resolution)
+  sphere.SetPhiResolution(resolution)
+  sphere.Update()
+  ret = sphere.GetOutput()
+  colors = np.zeros((ret.GetNumberOfPoints(), 3), dtype=np.uint8)
+  array = numpy_support.numpy_to_vtk(colors, deep=True)
+  array.SetName("Colors")
+  ret.GetPointData().AddArray(array)
+  return ret
+
+# one keyframe then delta frames of the same topology, one frame per message
+def messages(n_frames:int, resolution:int) -> t.List[bytes]:
+  polydata = mesh(resolution)
+  keyframe = poly_data_from_vtk_mesh(polydata)
+  delta = poly_data_from_vtk_mesh(polydata, ["Colors"], geometry=False)
+  frames = [FrameInfo(i, i*4.0/n_frames, keyframe if i == 0 else delta, 1, i == 0) for i in range(n_frames)]
+  return [cooke_message(i, MessageRecipe(n_frames, [frame])) for i, frame in enumerate(frames)]
+
+def network_worker(port:list, ready:Event, done:Event):
+  async def start():
+    async with serve(server.handle_message, "localhost", 0, max_size=None) as ws_server:
+      port.append(ws_server.sockets[0].getsockname()[1])
+      ready.set()
+      while not done.is_set(): await asyncio.sleep(0.01)
+  asyncio.run(start())
+
+def client_worker(port:int, payloads:t.List[bytes], repeat:int, sent:list):
+  async def start():
+    async with connect(f"ws://localhost:{port}", max_size=None, compression=None) as ws:
+      begin_sec = time.perf_counter()
+      for _ in range(repeat):
+        for payload in payloads: await ws.send(payload)
+      sent.append(time.perf_counter()-begin_sec)
+  asyncio.run(start())
+
+def stress(n_frames:int, resolution:int, repeat:int, render_sec:float, fps:float = 60.0):
+  payloads = messages(n_frames, resolution)
+  port:list = []
+  sent:list = []
+  ready, done = Event(), Event()
+  network = Thread(target=network_worker, args=(port, ready, done), daemon=True)
+  network.start()
+  ready.wait()
+
+  mapper = vtk.vtkPolyDataMapper()
+  playback = server.Playback(server.handoff, server.decoder)
+  client = Thread(target=client_worker, args=(port[0], payloads, repeat, sent), daemon=True)
+  client.start()
+
+  intervals = [] # (tick interval, client still sending)
+  shown = None
+  swaps = 0
+  period = 1/fps
+  last_sec = begin_sec = time.perf_counter()
+  while client.is_alive() or len(server.handoff) or time.perf_counter()-begin_sec < 1.0:
+    polydata, _ = playback.tick()
+    if polydata is not None and polydata is not shown:
+      shown = polydata
+      swaps += 1
+      mapper.SetInputData(polydata)
+      mapper.Update()
+    time.sleep(render_sec)
+    now = time.perf_counter()
+    intervals.append((now-last_sec, client.is_alive()))
+    last_sec = now
+    time.sleep(max(0.0, period-(time.perf_counter()-now)))
+  done.set()
+  network.join()
+
+  total = len(payloads)*repeat
+  print(f"{total} frames of {len(payloads[1])} bytes ({len(payloads[0])} keyframe) in {sent[0]*1000:.1f}ms, {total/sent[0]:.0f} frames/s, "
+        f"{len(playback.timeline)} frames on the timeline, {swaps} swaps, target tick {max(period, render_sec)*1000:.2f}ms")
+  for name, streaming in (("streaming", True), ("idle", False)):
+    ticks = np.array([sec for sec, alive in intervals[1:] if alive == streaming])*1000
+    if len(ticks) == 0: continue
+    print(f"  {name:>9} {len(ticks)} ticks, {ticks.mean():.2f}ms mean, p50 {np.percentile(ticks, 50):.2f}ms, p99 {np.percentile(ticks, 99):.2f}ms, "
+          f"max {ticks.max():.2f}ms, jitter (std) {ticks.std():.2f}ms")
+
+if __name__ == "__main__":
+  stress(200, 32, 10, 0.002)
+  stress(200, 128, 5, 0.002)
@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import vtk
+import numpy as np
+from vtk.util import numpy_support
+from lut import lut_from_name, apply_lut, ColorMap
+
+# ColorMap against vtkLookupTable.MapScalars, on and next to every bin edge, out of range and NaN
+RANGES = [(0.1, 1.7), (0.0, 1.0), (-3.3, 7.9), (2.5e-3, 9.1e4), (1.0, 1.0)]
+
+def bin_edge_values(rng:tuple[float,float], n_colors:int, dtype:np.dtype) -> np.ndarray:
+  edges = rng[0]+np.arange(n_colors+1)*(rng[1]-rng[0])/n_colors
+  values = np.concatenate([np.linspace(rng[0], rng[1], 10001), edges, [rng[0]-1, rng[1]+1, np.nan]]).astype(dtype)
+  # and the closest representable values on both sides of every edge
+  return np.concatenate([values, np.nextafter(values, -np.inf), np.nextafter(values, np.inf)])
+
+def check(n_colors:int, dtype:np.dtype, alpha:bool|None):
+  lut = lut_from_name("jet", n_colors)
+  color_map = ColorMap(lut, alpha=alpha)
+  for rng in RANGES:
+    values = bin_edge_values(rng, n_colors, dtype)
+    lut.SetTableRange(rng)
+    expected = numpy_support.vtk_to_numpy(lut.MapScalars(numpy_support.numpy_to_vtk(values), vtk.VTK_COLOR_MODE_DEFAULT, -1))
+    got = color_map.map(values, rng)
+    bad = np.nonzero((expected[:,:got.shape[1]] != got).any(axis=1))[0]
+    assert len(bad) == 0, f"{n_colors} colors, {np.dtype(dtype).name}, range {rng}: {len(bad)} differ, e.g. {values[bad][:4]}"
+
+def test_map_scalars_float64():
+  for n_colors in (256, 512): check(n_colors, np.float64, None)
+
+def test_map_scalars_float32():
+  for n_colors in (256, 512): check(n_colors, np.float32, None)
+
+def test_map_scalars_alpha():
+  check(256, np.float64, True)
+  check(256, np.float32, True)
+
+# colors of earlier meshes stay as they are when the same color map colors the next one
+def test_apply_lut_keeps_earlier_colors():
+  color_map = ColorMap(lut_from_name("jet", 256))
+  meshes = []
+  for i in range(2):
+    mesh = vtk.vtkPolyData()
+    scalars = numpy_support.numpy_to_vtk(np.linspace(0, 1, 1000)**(i+1))
+    scalars.SetName("s")
+    mesh.GetPointData().AddArray(scalars)
+    apply_lut(mesh, color_map, "s")
+    meshes.append(mesh)
+  first = numpy_support.vtk_to_numpy(meshes[0].GetPointData().GetArray("Colors"))
+  assert np.array_equal(first, ColorMap(lut_from_name("jet", 256)).map(np.linspace(0, 1, 1000), (0.0, 1.0)))
+
+if __name__ == "__main__":
+  for name, test in list(globals().items()):
+    if name.startswith("test_"):
+      test()
+      print(f"{name} ok")
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import flatbuffers
+from Envelope.Association import Association
+from Envelope.DataArray import DataArray as DataArrayTable
+from Envelope.Quantization import Quantization
+from quantize import QuantizeSpec, quantize, dequantize, parse_quantizations
+from poly_data import create_data_array_from_numpy, data_array_values
+
+def test_linear_round_trip():
+  values = np.random.default_rng(1).uniform(-5, 5, (1000, 3)).astype(np.float32)
+  for bits in (8, 16):
+    q, minimum, maximum = quantize(values, QuantizeSpec(Quantization.Linear, bits))
+    step = (maximum-minimum)/((1 << bits)-1)
+    restored = dequantize(q, Quantization.Linear, minimum, maximum, values.dtype)
+    assert np.all(np.abs(restored-values) <= step*0.5+1e-6)
+
+def test_non_finite_is_rejected():
+  for kind, shape in ((Quantization.Linear, (100,)), (Quantization.Linear, (100, 3)), (Quantization.Octahedral, (100, 3))):
+    for bad in (np.nan, np.inf, -np.inf):
+      values = np.ones(shape, dtype=np.float32)
+      values[7] = bad
+      try:
+        quantize(values, QuantizeSpec(kind, 16))
+      except ValueError:
+        continue
+      assert False, f"{bad} quantized with kind {kind}"
+
+# arrays the quantizer rejects are sent exactly, NaN included
+def test_non_finite_array_is_sent_exactly():
+  values = np.linspace(0, 1, 100, dtype=np.float32)
+  values[[3, 50]] = np.nan
+  builder = flatbuffers.Builder(1024)
+  errors = {}
+  builder.Finish(create_data_array_from_numpy(builder, "s", values, Association.Point, quantization=QuantizeSpec(Quantization.Linear, 8), errors=errors))
+  array = DataArrayTable.GetRootAs(builder.Output(), 0)
+  assert array.Quantization() == Quantization.Exact and "s" not in errors
+  assert np.array_equal(data_array_values(array), values, equal_nan=True)
+
+def test_parse_quantizations():
+  assert parse_quantizations("VelocityMag=8, Normals=oct16") == {"VelocityMag": QuantizeSpec(Quantization.Linear, 8), "Normals": QuantizeSpec(Quantization.Octahedral, 16)}
+  for bad in ("VelocityMag=x", "VelocityMag", "VelocityMag=12", "=8", "Normals=oct"):
+    try:
+      parse_quantizations(bad)
+    except ValueError as e:
+      assert repr(bad) in str(e), e
+      continue
+    assert False, f"{bad} parsed"
+
+if __name__ == "__main__":
+  for name, test in list(globals().items()):
+    if name.startswith("test_"):
+      test()
+      print(f"{name} ok")